@@ -0,0 +1,194 @@
+"""
+Interchangeable ASR engines behind one interface.
+
+Every backend is called like a Hugging Face ASR pipeline — with a list of
+{"raw": float32 16 kHz samples, "sampling_rate": sr} dicts, returning a
+list of {"text": ...} — so `whisper_transcribe.transcribe_files` and
+everything built on it (batching, VAD, cache, JSONL, workers, service)
+works the same whichever engine is underneath. `config()` is what the
+transcript cache keys on, so engines never share cached transcripts.
+"""
+import hashlib
+import sys
+
+LANGUAGE_CODE = "es"
+
+class ASRBackend:
+    """Base class: subclasses implement `transcribe_batch` and `config`."""
+
+    name = "base"
+
+    def transcribe_batch(self, chunks, sample_rate: int) -> list:
+        """Return one transcript string per float32 chunk."""
+        raise NotImplementedError
+
+    def config(self) -> dict:
+        """Everything that can change the output for the same audio."""
+        return {"backend": self.name}
+
+    def __call__(self, inputs, batch_size: int = None):
+        single = isinstance(inputs, dict)
+        items = [inputs] if single else list(inputs)
+        # all chunks come from the same 16 kHz pipeline stage
+        sample_rate = items[0]["sampling_rate"] if items else 16000
+        texts = self.transcribe_batch([item["raw"] for item in items], sample_rate)
+        outputs = [{"text": text} for text in texts]
+        return outputs[0] if single else outputs
+
+class TransformersBackend(ASRBackend):
+    """Hugging Face `transformers` pipeline (see `build_whisper_pipeline`)."""
+
+    name = "transformers"
+    default_model = "openai/whisper-large-v3"
+
+    def __init__(self, model_id: str = None, pipe=None, **pipeline_kwargs):
+        if pipe is None:
+            import whisper_transcribe
+            pipe = whisper_transcribe.build_whisper_pipeline(model_id or self.default_model, **pipeline_kwargs)
+        self.pipe = pipe
+        self.model = getattr(pipe, "model", None)
+
+    def transcribe_batch(self, chunks, sample_rate: int) -> list:
+        outputs = self.pipe(
+            [{"raw": chunk, "sampling_rate": sample_rate} for chunk in chunks],
+            batch_size=len(chunks),
+        )
+        return [out.get("text", "").strip() for out in outputs]
+
+    def __call__(self, inputs, batch_size: int = None):
+        # hand batches straight to the HF pipeline
+        if batch_size is None:
+            return self.pipe(inputs)
+        return self.pipe(inputs, batch_size=batch_size)
+
+    def config(self) -> dict:
+        import whisper_transcribe
+        return whisper_transcribe.model_config(self.pipe)
+
+class WhisperXBackend(ASRBackend):
+    """
+    WhisperX (faster-whisper underneath). `batch_size` batches the VAD
+    segments within one chunk; the chunks of a batch are still transcribed
+    one after another.
+    """
+
+    name = "whisperx"
+    default_model = "large-v3"
+
+    def __init__(self, model_id: str = None, device: str = None, compute_type: str = None,
+                 language: str = LANGUAGE_CODE, batch_size: int = 16):
+        import torch
+        import whisperx
+
+        self.model_id = model_id or self.default_model
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.language = language
+        self.batch_size = batch_size
+        self.compute_type = compute_type or ("float16" if self.device == "cuda" else "float32")
+        try:
+            self.model = whisperx.load_model(
+                self.model_id, self.device, compute_type=self.compute_type, language=language
+            )
+        except ValueError as e:
+            # e.g. a GPU without efficient float16 support
+            if self.device != "cuda" or compute_type:
+                raise
+            print(f"⚠️  {self.compute_type} not supported ({e}); falling back to int8", file=sys.stderr)
+            self.compute_type = "int8"
+            self.model = whisperx.load_model(
+                self.model_id, self.device, compute_type=self.compute_type, language=language
+            )
+
+    def transcribe_batch(self, chunks, sample_rate: int) -> list:
+        texts = []
+        for chunk in chunks:
+            result = self.model.transcribe(chunk, batch_size=self.batch_size, language=self.language)
+            texts.append(" ".join(seg["text"].strip() for seg in result["segments"]))
+        return texts
+
+    def config(self) -> dict:
+        return {
+            "backend": self.name,
+            "model_id": self.model_id,
+            "compute_type": self.compute_type,
+            "language": self.language,
+        }
+
+class CTranslate2Backend(ASRBackend):
+    """
+    faster-whisper on CTranslate2, int8 on CPU by default. The chunks of a
+    batch are transcribed one after another.
+    """
+
+    name = "ctranslate2"
+    default_model = "large-v3"
+
+    def __init__(self, model_id: str = None, device: str = "cpu", compute_type: str = "int8",
+                 cpu_threads: int = 0, beam_size: int = 5, language: str = LANGUAGE_CODE):
+        from faster_whisper import WhisperModel
+
+        self.model_id = model_id or self.default_model
+        self.compute_type = compute_type
+        self.beam_size = beam_size
+        self.language = language
+        self.model = WhisperModel(
+            self.model_id, device=device, compute_type=compute_type, cpu_threads=cpu_threads
+        )
+
+    def transcribe_batch(self, chunks, sample_rate: int) -> list:
+        texts = []
+        for chunk in chunks:
+            segments, _ = self.model.transcribe(
+                chunk, language=self.language, beam_size=self.beam_size
+            )
+            texts.append(" ".join(seg.text.strip() for seg in segments))
+        return texts
+
+    def config(self) -> dict:
+        return {
+            "backend": self.name,
+            "model_id": self.model_id,
+            "compute_type": self.compute_type,
+            "beam_size": self.beam_size,
+            "language": self.language,
+        }
+
+class StubBackend(ASRBackend):
+    """
+    Deterministic stand-in for tests and benchmarks: no model, no network.
+    Each chunk becomes about `words_per_second` words chosen from a hash of
+    its samples, so equal audio always gives equal text.
+    """
+
+    name = "stub"
+    WORDS = ("uno", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve", "diez")
+
+    def __init__(self, model_id: str = None, words_per_second: float = 2.0):
+        self.words_per_second = words_per_second
+        self.calls = 0
+
+    def transcribe_batch(self, chunks, sample_rate: int) -> list:
+        self.calls += 1
+        texts = []
+        for chunk in chunks:
+            digest = hashlib.sha256(chunk.tobytes()).digest()
+            n_words = int(len(chunk) / sample_rate * self.words_per_second)
+            texts.append(" ".join(self.WORDS[digest[i % len(digest)] % len(self.WORDS)]
+                                  for i in range(n_words)))
+        return texts
+
+    def config(self) -> dict:
+        return {"backend": self.name, "words_per_second": self.words_per_second}
+
+BACKENDS = {
+    cls.name: cls
+    for cls in (TransformersBackend, WhisperXBackend, CTranslate2Backend, StubBackend)
+}
+
+def build_backend(name: str = "transformers", model_id: str = None, **kwargs) -> ASRBackend:
+    """Instantiate the backend registered as `name`, with its default model unless `model_id`."""
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown ASR backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return cls(model_id=model_id, **kwargs)
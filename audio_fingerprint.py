@@ -0,0 +1,218 @@
+"""
+Spectral-peak fingerprints of 16 kHz PCM, for finding duplicate recordings.
+
+Each recording is reduced to the prominent peaks of its spectrogram, and
+pairs of nearby peaks are hashed as (freq1, freq2, time gap). Two
+recordings are the same audio when many of their hashes agree at one
+consistent time offset, which survives re-encoding, small level changes
+and a different trim at the start. Everything is vectorized with NumPy.
+
+`FingerprintDB` keeps fingerprints (and the transcripts made for them) in
+a SQLite file, so duplicates are found across folders and runs.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_DB_PATH = Path.home() / ".cache" / "portrait_transcriber" / "fingerprints.sqlite"
+
+N_FFT = 512           # 32 ms analysis window at 16 kHz
+HOP = 256             # 16 ms between frames
+PEAK_FRAMES = 2       # a peak is the maximum within ±2 frames...
+PEAK_BINS = 3         # ...and ±3 frequency bins
+PEAK_FLOOR_DB = 20.0  # ...and this far above the median level (room noise doesn't survive re-encoding)
+PEAKS_PER_S = 100     # strongest peaks kept per second of audio
+FAN_OUT = 5           # later peaks paired with each anchor peak
+MAX_DT = 63           # largest anchor→target gap, in frames
+OFFSET_TOLERANCE = 1  # frames; a trim that isn't a multiple of HOP moves peaks by one
+MIN_MATCHES = 15      # aligned hashes needed to call two recordings the same...
+MATCH_RATIO = 0.15    # ...and this share of the smaller fingerprint
+MIN_LENGTH_RATIO = 0.8  # shorter/longer duration; keeps a snippet from matching a whole answer
+
+def spectrogram_db(samples, sr: int = 16000):
+    """Log-magnitude STFT (frames × bins) of int16 or float samples."""
+    x = np.asarray(samples, dtype=np.float32)
+    if samples.dtype == np.int16:
+        x = x / 32768.0
+    if len(x) < N_FFT:
+        return np.zeros((0, N_FFT // 2 + 1), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(x, N_FFT)[::HOP]
+    spec = np.abs(np.fft.rfft(frames * np.hanning(N_FFT).astype(np.float32), axis=1))
+    return 20 * np.log10(spec + 1e-9)
+
+def _local_max(spec):
+    """Max over the ±PEAK_FRAMES × ±PEAK_BINS neighbourhood of every cell."""
+    padded = np.pad(spec, ((PEAK_FRAMES, PEAK_FRAMES), (PEAK_BINS, PEAK_BINS)),
+                    constant_values=-np.inf)
+    windows = np.lib.stride_tricks.sliding_window_view(
+        padded, (2 * PEAK_FRAMES + 1, 2 * PEAK_BINS + 1)
+    )
+    return windows.max(axis=(2, 3))
+
+def find_peaks(spec, sr: int = 16000):
+    """(frame, bin) arrays of the strongest local maxima, in time order."""
+    if spec.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    is_peak = (spec == _local_max(spec)) & (spec > np.median(spec) + PEAK_FLOOR_DB)
+    t, f = np.nonzero(is_peak)
+    limit = max(1, int(PEAKS_PER_S * len(spec) * HOP / sr))
+    if len(t) > limit:
+        keep = np.argsort(spec[t, f])[-limit:]
+        t, f = t[keep], f[keep]
+    order = np.lexsort((f, t))
+    return t[order], f[order]
+
+def fingerprint(samples, sr: int = 16000):
+    """
+    Return (hashes, times): one int64 hash per peak pair and the frame of
+    its anchor peak. Silence yields empty arrays.
+    """
+    t, f = find_peaks(spectrogram_db(samples, sr), sr)
+    hashes, times = [], []
+    for k in range(1, FAN_OUT + 1):
+        dt = t[k:] - t[:-k] if len(t) > k else np.zeros(0, dtype=np.int64)
+        ok = (dt >= 1) & (dt <= MAX_DT)
+        anchor = np.flatnonzero(ok)
+        hashes.append((f[anchor] << 16) | (f[anchor + k] << 6) | dt[ok])
+        times.append(t[anchor])
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hashes).astype(np.int64), np.concatenate(times).astype(np.int64)
+
+def aligned_matches(times_a, times_b) -> int:
+    """
+    Largest number of hash pairs agreeing on one time offset (b − a),
+    give or take OFFSET_TOLERANCE frames.
+    """
+    if len(times_a) == 0:
+        return 0
+    offsets = np.asarray(times_b) - np.asarray(times_a)
+    counts = np.bincount(offsets - offsets.min())
+    return int(np.convolve(counts, np.ones(2 * OFFSET_TOLERANCE + 1, dtype=np.int64)).max())
+
+def is_match(aligned: int, n_a: int, n_b: int, dur_a: float, dur_b: float) -> bool:
+    if aligned < MIN_MATCHES or aligned < MATCH_RATIO * min(n_a, n_b):
+        return False
+    longer = max(dur_a, dur_b)
+    return longer > 0 and min(dur_a, dur_b) / longer >= MIN_LENGTH_RATIO
+
+def config_key(config: dict) -> str:
+    """Short hash of a transcription config, so transcripts are only reused under it."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+class FingerprintDB:
+    """
+    SQLite store of recording fingerprints, plus the transcript produced
+    for each recording under a given config. Use ":memory:" for a store
+    that only lives for one run.
+    """
+
+    def __init__(self, path: Path = DEFAULT_DB_PATH):
+        if str(path) != ":memory:":
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(str(path), timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS recordings ("
+            " id INTEGER PRIMARY KEY,"
+            " path TEXT UNIQUE NOT NULL,"
+            " duration REAL NOT NULL,"
+            " n_hashes INTEGER NOT NULL,"
+            " added REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " hash INTEGER NOT NULL,"
+            " recording INTEGER NOT NULL,"
+            " t INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS hashes_hash ON hashes(hash);"
+            "CREATE INDEX IF NOT EXISTS hashes_recording ON hashes(recording);"
+            "CREATE TABLE IF NOT EXISTS results ("
+            " recording INTEGER NOT NULL,"
+            " config TEXT NOT NULL,"
+            " record TEXT NOT NULL,"
+            " PRIMARY KEY (recording, config));"
+        )
+        self._db.commit()
+
+    def match(self, path, hashes, times, duration: float):
+        """
+        The stored recording (other than `path` itself) that this
+        fingerprint matches best, as (id, path, aligned hashes), or None.
+        """
+        if len(hashes) < MIN_MATCHES:
+            return None
+        with self._db:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS probe (hash INTEGER, t INTEGER)")
+            self._db.execute("DELETE FROM probe")
+            self._db.executemany(
+                "INSERT INTO probe VALUES (?, ?)", zip(hashes.tolist(), times.tolist())
+            )
+            rows = self._db.execute(
+                "SELECT h.recording, p.t, h.t FROM probe p JOIN hashes h ON h.hash = p.hash"
+                " JOIN recordings r ON r.id = h.recording WHERE r.path != ?",
+                (str(path),),
+            ).fetchall()
+        if not rows:
+            return None
+        rec, t_probe, t_stored = np.array(rows, dtype=np.int64).T
+        best = None
+        for candidate in np.unique(rec):
+            sel = rec == candidate
+            aligned = aligned_matches(t_probe[sel], t_stored[sel])
+            if aligned >= MIN_MATCHES and (best is None or aligned > best[1]):
+                best = (int(candidate), aligned)
+        if best is None:
+            return None
+        stored_path, stored_duration, n_stored = self._db.execute(
+            "SELECT path, duration, n_hashes FROM recordings WHERE id = ?", (best[0],)
+        ).fetchone()
+        if not is_match(best[1], len(hashes), n_stored, duration, stored_duration):
+            return None
+        return best[0], stored_path, best[1]
+
+    def add(self, path, hashes, times, duration: float) -> int:
+        """Store (or replace) the fingerprint of `path`; returns its id."""
+        with self._db:
+            self._db.execute(
+                "INSERT INTO recordings (path, duration, n_hashes, added) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET duration = excluded.duration,"
+                " n_hashes = excluded.n_hashes, added = excluded.added",
+                (str(path), duration, len(hashes), time.time()),
+            )
+            rec = self._db.execute(
+                "SELECT id FROM recordings WHERE path = ?", (str(path),)
+            ).fetchone()[0]
+            self._db.execute("DELETE FROM hashes WHERE recording = ?", (rec,))
+            self._db.execute("DELETE FROM results WHERE recording = ?", (rec,))
+            self._db.executemany(
+                "INSERT INTO hashes (hash, recording, t) VALUES (?, ?, ?)",
+                ((h, rec, t) for h, t in zip(hashes.tolist(), times.tolist())),
+            )
+        return rec
+
+    def get_result(self, recording: int, config: str):
+        row = self._db.execute(
+            "SELECT record FROM results WHERE recording = ? AND config = ?", (recording, config)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_result(self, recording: int, config: str, record: dict):
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (recording, config, record) VALUES (?, ?, ?)",
+                (recording, config, json.dumps(record, ensure_ascii=False)),
+            )
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
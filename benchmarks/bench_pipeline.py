@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Time every pipeline stage, separately and end to end, on synthetic audio.
+
+Runs entirely offline: transcription uses the `stub` ASR backend, so the
+numbers measure our own code (ffmpeg conversion, audio loading, chunking,
+feature extraction, table building, validation), not Whisper itself.
+Results go to a JSON file so runs can be compared over time:
+
+    python benchmarks/bench_pipeline.py --output bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+import build_transcript
+import convert_and_trim
+import run_pipeline
+import validate_responses
+import whisper_transcribe
+from asr_backends import StubBackend
+
+from fixtures import make_fixtures
+
+class FeatureStub(StubBackend):
+    """Stub that also computes Whisper's log-mel features, as the real pipeline does."""
+
+    name = "stub-features"
+
+    def __init__(self, model_id: str = None, n_mels: int = 128):
+        super().__init__(model_id)
+        from transformers import WhisperFeatureExtractor
+        self.extractor = WhisperFeatureExtractor(feature_size=n_mels)
+
+    def transcribe_batch(self, chunks, sample_rate: int) -> list:
+        self.extractor(list(chunks), sampling_rate=sample_rate, return_tensors="np")
+        return super().transcribe_batch(chunks, sample_rate)
+
+def timed(fn, repeat: int, setup=None) -> list:
+    """Wall-clock seconds of `repeat` calls to `fn`, with the stage's own output silenced."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+    return times
+
+def summarize(times, files: int = None, audio_seconds: float = None) -> dict:
+    best = min(times)
+    out = {"seconds": [round(t, 6) for t in times], "min": best, "median": statistics.median(times)}
+    if files is not None:
+        out["files"] = files
+    if audio_seconds:
+        out["audio_seconds"] = audio_seconds
+        out["x_real_time"] = audio_seconds / best if best else None
+    return out
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def fresh_copy(src: Path, dst: Path):
+    """Reset `dst` to only the .webm files of `src` (no WAVs, manifest or outputs)."""
+    if dst.exists():
+        shutil.rmtree(dst)
+    dst.mkdir(parents=True)
+    for f in src.glob("*.webm"):
+        shutil.copy2(f, dst / f.name)
+
+def _quiet(fn, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+def run_benchmarks(work: Path, users: int = 2, repeat: int = 3, jobs: int = 4,
+                   batch_size: int = 8) -> dict:
+    src = work / "fixtures"
+    info = make_fixtures(src, users=users)
+    trim_map = _quiet(convert_and_trim.load_trim_map, Path(info["trim_map"]))
+    audio_s = info["audio_seconds"]
+    n = info["files"]
+    stages = {}
+
+    # ─── 1. Conversion
+    folder = work / "BENCH"
+    fresh_copy(src, folder)
+    for j in sorted({1, jobs}):
+        stages[f"convert_jobs{j}"] = summarize(timed(
+            lambda: convert_and_trim.convert_folder(folder, trim_map, jobs=j, force=True), repeat
+        ), n, audio_s)
+    stages["convert_up_to_date"] = summarize(timed(
+        lambda: convert_and_trim.convert_folder(folder, trim_map, jobs=jobs), repeat
+    ), n, audio_s)
+    wavs = whisper_transcribe.list_wavs(convert_and_trim.wav_dir_for(folder))
+
+    # ─── 2. Loading and chunking
+    def plan_all(vad):
+        for wav in wavs:
+            samples, sr = whisper_transcribe.load_audio(wav)
+            whisper_transcribe.plan_chunks(samples, sr, vad=vad)
+    stages["load_and_chunk_fixed"] = summarize(timed(lambda: plan_all(False), repeat), n, audio_s)
+    stages["load_and_chunk_vad"] = summarize(timed(lambda: plan_all(True), repeat), n, audio_s)
+
+    # ─── 3. transcribe_file / transcribe_files with a stub model
+    stub = StubBackend()
+    stages["transcribe_file_stub"] = summarize(timed(
+        lambda: [whisper_transcribe.transcribe_file(stub, wav) for wav in wavs], repeat
+    ), n, audio_s)
+    try:
+        features = FeatureStub()
+    except ImportError:
+        features = None
+    if features is not None:
+        stages["transcribe_file_features"] = summarize(timed(
+            lambda: [whisper_transcribe.transcribe_file(features, wav) for wav in wavs], repeat
+        ), n, audio_s)
+    jsonl = folder / "whisper_output.jsonl"
+    stages[f"transcribe_files_batch{batch_size}_stub"] = summarize(timed(
+        lambda: whisper_transcribe.write_jsonl(
+            whisper_transcribe.transcribe_files(stub, wavs, batch_size=batch_size), jsonl
+        ), repeat
+    ), n, audio_s)
+
+    # ─── 4. Tables and validation
+    paths = run_pipeline.folder_outputs(folder)
+    stages["build_transcript"] = summarize(timed(
+        lambda: build_transcript.build_transcript(jsonl, paths["csv"], paths["xlsx"]), repeat
+    ), n)
+    stages["validate_responses"] = summarize(timed(
+        lambda: validate_responses.validate_csv(paths["csv"], "transcript_whisper"), repeat
+    ), n)
+
+    # ─── 5. End to end, from .webm to validated CSV
+    for stream in (False, True):
+        stages["end_to_end" + ("_stream" if stream else "")] = summarize(timed(
+            lambda: run_pipeline.run_folder(
+                folder, trim_map, stub, jobs=jobs, stream=stream, batch_size=batch_size
+            ),
+            repeat, setup=lambda: fresh_copy(src, folder),
+        ), n, audio_s)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {"users": users, "repeat": repeat, "jobs": jobs, "batch_size": batch_size},
+        "fixtures": info,
+        "stages": stages,
+    }
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark each pipeline stage on synthetic audio.")
+    p.add_argument("--output", type=Path, default=Path("bench_results.json"),
+                   help="JSON file to write (default: bench_results.json)")
+    p.add_argument("--users", type=int, default=2, help="Synthetic participants (default: 2)")
+    p.add_argument("--repeat", type=int, default=3, help="Runs per stage (default: 3)")
+    p.add_argument("-j", "--jobs", type=int, default=4, help="Parallel conversions (default: 4)")
+    p.add_argument("--batch-size", type=int, default=8, help="Chunks per model call (default: 8)")
+    p.add_argument("--workdir", type=Path, default=None,
+                   help="Keep fixtures and outputs here instead of a temporary folder")
+    args = p.parse_args()
+
+    work = args.workdir or Path(tempfile.mkdtemp(prefix="portrait_bench_"))
+    try:
+        report = run_benchmarks(work, users=args.users, repeat=max(1, args.repeat),
+                                jobs=max(1, args.jobs), batch_size=max(1, args.batch_size))
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(work, ignore_errors=True)
+
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    for name, stage in report["stages"].items():
+        speed = f"  {stage['x_real_time']:8.1f}× real time" if stage.get("x_real_time") else ""
+        print(f"  {name:<28} {stage['min'] * 1000:9.1f} ms{speed}")
+    print(f"✅ Benchmark results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Measure how long each pipeline script takes to start, and which heavy
+libraries it loads just by being imported.
+
+Each module is imported, and each script run with --help, in a fresh
+interpreter (best of --repeat runs). Heavy dependencies (torch,
+transformers, pandas...) must only be imported by the code paths that
+need them; the run fails if one shows up at import time or if --help is
+slower than --max-seconds, so import cost can't creep back unnoticed:
+
+    python benchmarks/bench_startup.py --output startup.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+
+SCRIPTS = [
+    "convert_and_trim", "whisper_transcribe", "build_transcript", "validate_responses",
+    "run_pipeline", "transcription_service", "transcript_index",
+]
+MODULES = SCRIPTS + ["asr_backends", "audio_fingerprint", "prescreen", "py_runall", "py_runall_whisperx"]
+# may only be imported where they're used, never at module import
+HEAVY = ["torch", "transformers", "whisperx", "faster_whisper", "pandas", "pyarrow",
+         "soundfile", "openpyxl", "xlsxwriter"]
+
+PROBE = (
+    "import sys, time, json; t = time.perf_counter(); import {module}; "
+    "print(json.dumps([time.perf_counter() - t, [m for m in {heavy!r} if m in sys.modules]]))"
+)
+
+def time_import(module: str) -> tuple:
+    """(seconds, heavy modules loaded) for importing `module` in a fresh interpreter."""
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+        cwd=REPO, capture_output=True, text=True, check=True,
+    ).stdout
+    seconds, heavy = json.loads(out.strip().splitlines()[-1])
+    return seconds, heavy
+
+def time_help(script: str) -> float:
+    """Wall-clock seconds of `python {script}.py --help`, interpreter start included."""
+    t0 = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(REPO / f"{script}.py"), "--help"],
+        cwd=REPO, capture_output=True, check=True,
+    )
+    return time.perf_counter() - t0
+
+def time_interpreter() -> float:
+    """Seconds for a bare `python -c pass`, the floor under every other number."""
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - t0
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark import and --help time of the pipeline scripts.")
+    p.add_argument("--output", type=Path, default=Path("startup_results.json"),
+                   help="JSON file to write (default: startup_results.json)")
+    p.add_argument("--repeat", type=int, default=5, help="Runs per measurement (default: 5)")
+    p.add_argument("--max-seconds", type=float, default=1.0,
+                   help="Fail if any --help takes longer than this (default: 1.0)")
+    args = p.parse_args()
+    repeat = max(1, args.repeat)
+
+    baseline = min(time_interpreter() for _ in range(repeat))
+    results, problems = {}, []
+    for module in MODULES:
+        runs = [time_import(module) for _ in range(repeat)]
+        heavy = sorted({m for _, loaded in runs for m in loaded})
+        results[module] = {"import_seconds": min(s for s, _ in runs), "heavy_imports": heavy}
+        if heavy:
+            problems.append(f"importing {module} loads {', '.join(heavy)}")
+    for script in SCRIPTS:
+        best = min(time_help(script) for _ in range(repeat))
+        results[script]["help_seconds"] = best
+        if best > args.max_seconds:
+            problems.append(f"{script}.py --help took {best:.2f}s (limit {args.max_seconds}s)")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "interpreter_seconds": baseline,
+        "repeat": repeat,
+        "modules": results,
+        "problems": problems,
+    }
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    print(f"  {'(bare interpreter)':<24} {'':>10} {baseline * 1000:9.1f} ms")
+    for name, r in results.items():
+        help_ms = f"{r['help_seconds'] * 1000:9.1f} ms" if "help_seconds" in r else ""
+        print(f"  {name:<24} {r['import_seconds'] * 1000:7.1f} ms {help_ms}")
+    print(f"✅ Startup results written to {args.output}")
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
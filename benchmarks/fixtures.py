@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Synthetic recordings for the benchmarks, generated locally and reproducibly.
+
+Each answer is speech-like sound (harmonic "syllables" with a wobbling
+pitch, plus a little noise) separated by near-silent pauses, in a chosen
+duration and silence ratio. Files are named like real exports,
+`{user}_GR_Survey_q{N}_{take}.webm`, and come with a matching trim map.
+"""
+import argparse
+import subprocess
+import sys
+import wave
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+QUESTIONNAIRE = "GR_Survey"
+TRIM_S = 0.5  # prompt trimmed from the start of every answer
+DURATIONS = (2, 8, 20, 45)
+SILENCE_RATIOS = (0.1, 0.5, 0.9)
+
+def synth_answer(duration_s: float, silence_ratio: float, seed: int, sr: int = SAMPLE_RATE):
+    """int16 mono samples: `duration_s` long, about `silence_ratio` of it pauses."""
+    rng = np.random.default_rng(seed)
+    n = int(duration_s * sr)
+    out = rng.normal(0, 30, n)  # room noise, about -60 dBFS
+    pos = 0
+    while pos < n:
+        speech = int(rng.uniform(0.15, 0.4) * sr)  # one "syllable"
+        pause = int(speech * silence_ratio / max(1e-3, 1 - silence_ratio) * rng.uniform(0.5, 1.5))
+        end = min(n, pos + speech)
+        t = np.arange(end - pos) / sr
+        f0 = rng.uniform(110, 220) * (1 + 0.05 * np.sin(2 * np.pi * 4 * t))
+        phase = 2 * np.pi * np.cumsum(f0) / sr
+        tone = sum(np.sin(k * phase) / k for k in range(1, 6))
+        out[pos:end] += 6000 * np.hanning(end - pos) * tone
+        pos = end + pause
+    return np.clip(out, -32768, 32767).astype(np.int16)
+
+def write_wav(path: Path, samples, sr: int = SAMPLE_RATE):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(samples.tobytes())
+
+def encode_webm(wav_path: Path, webm_path: Path):
+    """Opus-in-WebM at 48 kHz, like the browser recordings."""
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", str(wav_path),
+         "-ar", "48000", "-c:a", "libopus", "-b:a", "32k", str(webm_path)],
+        check=True,
+    )
+
+def make_fixtures(out_dir: Path, users: int = 2, durations=DURATIONS,
+                  silence_ratios=SILENCE_RATIOS, webm: bool = True) -> dict:
+    """
+    Write one answer per (user, duration, silence ratio) into `out_dir`,
+    as .webm (plus the trim map) or, with `webm=False`, as 16 kHz WAVs.
+    Returns a description of what was generated.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    files, audio_s = [], 0.0
+    for u in range(users):
+        q = 0
+        for duration in durations:
+            for ratio in silence_ratios:
+                q += 1
+                stem = f"user{u:02d}_{QUESTIONNAIRE}_q{q}_take1"
+                samples = synth_answer(duration + (TRIM_S if webm else 0), ratio, seed=1000 * u + q)
+                wav_path = out_dir / f"{stem}.wav"
+                write_wav(wav_path, samples)
+                if webm:
+                    encode_webm(wav_path, out_dir / f"{stem}.webm")
+                    wav_path.unlink()
+                files.append(f"{stem}.{'webm' if webm else 'wav'}")
+                audio_s += duration
+    trim_map = None
+    if webm:
+        trim_map = out_dir.parent / f"{out_dir.name}_trim_map.txt"
+        trim_map.write_text(
+            "".join(f"{QUESTIONNAIRE}_q{q}_ {TRIM_S}\n" for q in range(1, q + 1)), encoding="utf-8"
+        )
+    return {
+        "dir": str(out_dir),
+        "files": len(files),
+        "audio_seconds": audio_s,
+        "durations": list(durations),
+        "silence_ratios": list(silence_ratios),
+        "trim_map": str(trim_map) if trim_map else None,
+    }
+
+def main():
+    p = argparse.ArgumentParser(description="Generate synthetic benchmark recordings.")
+    p.add_argument("out_dir", type=Path, help="Folder to write the recordings into")
+    p.add_argument("--users", type=int, default=2, help="Participants to generate (default: 2)")
+    p.add_argument("--wav", action="store_true", help="Write 16 kHz WAVs instead of .webm")
+    args = p.parse_args()
+    try:
+        info = make_fixtures(args.out_dir, users=args.users, webm=not args.wav)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"❌ Could not generate fixtures: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"✅ {info['files']} files, {info['audio_seconds']:.0f}s of audio in {info['dir']}")
+
+if __name__ == "__main__":
+    main()
@@ -1,97 +1,267 @@
 #!/usr/bin/env python3
+from __future__ import annotations
+
 import argparse
+import hashlib
 import json
-import os
 import re
-import pandas as pd
+import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+from instrumentation import RunReport, stage
+from transcript_index import TranscriptIndex
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported where used, so --help and imports stay fast
 
 def parse_args():
     p = argparse.ArgumentParser(
-        description="Merge Whisper JSONL into CSV/Excel table"
+        description="Merge Whisper JSONL into CSV/Excel/Parquet tables"
     )
     p.add_argument("-w", "--whisper_jsonl",  type=Path, required=True,
                    help="Whisper JSONL (transcript_whisper key)")
     p.add_argument("-c", "--output_csv",     type=Path, required=True,
                    help="Output CSV path")
-    p.add_argument("-x", "--output_xlsx",    type=Path, required=True,
-                   help="Output Excel path")
+    p.add_argument("-x", "--output_xlsx",    type=Path, default=None,
+                   help="Output Excel path (omit to skip Excel)")
+    p.add_argument("-p", "--output_parquet", type=Path, default=None,
+                   help="Output Parquet path")
+    p.add_argument("--dataset_dir",          type=Path, default=None,
+                   help="Shared Parquet dataset, partitioned by questionnaire/username, "
+                        "to add this table to")
+    p.add_argument("--index_db",             type=Path, default=None,
+                   help="Cross-folder SQLite index to upsert this table into "
+                        "(query it with transcript_index.py)")
     return p.parse_args()
 
-def load_jsonl(path: Path, key: str):
-    """Return dict[audio_filepath] → value for the given key."""
-    d = {}
-    for line in path.open("r", encoding="utf-8"):
-        obj = json.loads(line)
-        fp = obj.get("audio_filepath")
-        d[fp] = obj.get(key, "")
-    return d
+CHUNK_ROWS = 100_000  # JSONL records parsed into one DataFrame block
+EXCEL_MAX_ROWS = 1_048_576  # per sheet, header included
+PARTITION_COLS = ["questionnaire", "username"]
+UNKNOWN_PARTITION = "unknown"  # partition for file names that don't parse
 
-def main():
-    args = parse_args()
+# username/questionnaire/question from a file name such as
+# "alice_GR_Survey_q16_1699999999.wav"
+FILENAME_PATTERN = r"""(?x)
+    ^(?P<username>[^_]+)
+    _(?P<questionnaire>[^_]+_[^_]+)
+    _(?P<question>q(?P<qnum>\d+))
+"""
+
+def _block(paths, transcripts, durations, originals) -> pd.DataFrame:
+    import pandas as pd
+    # object columns even when empty: an empty list would become float64,
+    # which parse_filenames' .str can't handle
+    block = pd.DataFrame({
+        "audio_filepath": pd.Series(paths, dtype=object),
+        "duration": pd.Series(durations, dtype=object),
+        "transcript_whisper": pd.Series(transcripts, dtype=object),
+    })
+    # only runs with --dedup mark duplicates; other tables keep their columns
+    if any(original is not None for original in originals):
+        block["duplicate_of"] = originals
+    return block
+
+def iter_whisper_jsonl(path: Path, chunk_rows: int = CHUNK_ROWS):
+    """
+    Stream `path` as DataFrame blocks of up to `chunk_rows` records with
+    (audio_filepath, duration, transcript_whisper) columns, plus
+    duplicate_of when a record has it, parsing each line once. Blank lines and an unparseable (torn) line are skipped.
+    Always yields at least one (possibly empty) block.
+    """
+    paths, transcripts, durations, originals = [], [], [], []
+    yielded = False
+    with path.open("r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️  Skipping unreadable line {lineno} of {path}", file=sys.stderr)
+                continue
+            paths.append(obj.get("audio_filepath"))
+            transcripts.append(obj.get("transcript", ""))
+            durations.append(obj.get("duration", ""))
+            originals.append(obj.get("duplicate_of"))
+            if len(paths) >= chunk_rows:
+                yield _block(paths, transcripts, durations, originals)
+                yielded = True
+                paths, transcripts, durations, originals = [], [], [], []
+    if paths or not yielded:
+        yield _block(paths, transcripts, durations, originals)
+
+def read_whisper_jsonl(path: Path, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Read `path` in one streaming pass (see `iter_whisper_jsonl`), so only
+    the columns themselves are held in memory. When a file appears more
+    than once (e.g. a re-run appended to the JSONL), its last record wins.
+    """
+    import pandas as pd
+    blocks = list(iter_whisper_jsonl(path, chunk_rows))
+    df = pd.concat(blocks, ignore_index=True) if len(blocks) > 1 else blocks[0]
+    return df.drop_duplicates("audio_filepath", keep="last")
+
+def parse_filenames(filepaths: pd.Series) -> pd.DataFrame:
+    """
+    Split the file names of `filepaths` into username, questionnaire,
+    question and a nullable integer qnum, all at once. Names that don't
+    follow the pattern get empty strings and a missing qnum.
+    """
+    import pandas as pd
+    names = filepaths.fillna("").str.replace(r"^.*[\\/]", "", regex=True)
+    parts = names.str.extract(FILENAME_PATTERN)
+    qnum = pd.to_numeric(parts.pop("qnum")).astype("Int64")
+    parts = parts.fillna("")
+    parts["qnum"] = qnum
+    return parts
+
+def write_excel(df: pd.DataFrame, output_xlsx: Path) -> bool:
+    """
+    Write `df` to `output_xlsx` row by row with xlsxwriter's constant-memory
+    mode (openpyxl via pandas if xlsxwriter is missing). Tables longer than
+    Excel's row limit continue on further sheets, with a warning. Returns
+    False if the file had to be skipped (too long for openpyxl); a copy
+    left by an earlier run is then removed rather than left out of date.
+    """
+    try:
+        import xlsxwriter
+    except ImportError:
+        if len(df) >= EXCEL_MAX_ROWS:
+            print(f"⚠️  {len(df)} rows exceed Excel's limit; install xlsxwriter to split them "
+                  f"across sheets. Skipping {output_xlsx}", file=sys.stderr)
+            output_xlsx.unlink(missing_ok=True)
+            return False
+        df.to_excel(output_xlsx, index=False)
+        return True
+
+    per_sheet = EXCEL_MAX_ROWS - 1
+    if len(df) > per_sheet:
+        print(f"⚠️  {len(df)} rows exceed Excel's limit of {per_sheet} per sheet; "
+              f"splitting {output_xlsx.name} into {-(-len(df) // per_sheet)} sheets", file=sys.stderr)
+    header = list(df.columns)
+    with xlsxwriter.Workbook(str(output_xlsx), {"constant_memory": True}) as book:
+        for start in range(0, max(len(df), 1), per_sheet):
+            sheet = book.add_worksheet(f"Sheet{start // per_sheet + 1}")
+            sheet.write_row(0, 0, header)
+            block = df.iloc[start:start + per_sheet].astype(object)
+            block = block.where(block.notna(), None)
+            for r, row in enumerate(block.itertuples(index=False, name=None), 1):
+                sheet.write_row(r, 0, row)
+    return True
+
+def _arrow_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` with typed columns for Arrow: numeric duration, missing names as nulls."""
+    import pandas as pd
+    out = df.copy()
+    out["duration"] = pd.to_numeric(out["duration"], errors="coerce")
+    for col in ("username", "questionnaire", "question"):
+        out[col] = out[col].replace("", None)
+    return out
 
-    # Load both transcripts
-    whisper_transcript = load_jsonl(args.whisper_jsonl, "transcript")
-    whisper_duration = load_jsonl(args.whisper_jsonl, "duration")
-
-    # regex for username/questionnaire/question
-    pattern = re.compile(r"""
-        ^(?P<username>[^_]+)
-        _(?P<questionnaire>[^_]+_[^_]+)
-        _(?P<question>q\d+)
-    """, re.VERBOSE)
-
-    records = []
-    for fp in sorted(whisper_transcript.keys()):
-        fname = os.path.basename(fp)
-        m = pattern.match(fname)
-        if m:
-            uname = m.group("username")
-            qn = m.group("questionnaire")
-            q = m.group("question")
-        else:
-            uname = qn = q = ""
-
-        records.append({
-            "audio_filepath":     fp,
-            "username":           uname,
-            "questionnaire":      qn,
-            "question":           q,
-            "duration":           whisper_duration.get(fp, ""),
-            "transcript_whisper": whisper_transcript.get(fp, ""),
-        })
-
-    df = pd.DataFrame(records)
-
-    # -- SORT: first by questionnaire, then by question number extracted from 'qNN' --
-    # Extract numeric part (e.g. 'q16' → 16)
-    df['qnum'] = (
-        df['question']
-          .str.extract(r'q(\d+)', expand=False)
-          .astype(int)
+def write_parquet(df: pd.DataFrame, output_parquet: Path):
+    _arrow_ready(df).to_parquet(output_parquet, index=False)
+
+def _dataset_tag(folder: str) -> str:
+    """File-name prefix of `folder`'s share of a dataset: its name plus a hash of its path."""
+    name = re.sub(r"[^\w.-]", "_", Path(folder).name) or "folder"
+    return f"{name}-{hashlib.sha1(folder.encode('utf-8')).hexdigest()[:8]}"
+
+def write_dataset(df: pd.DataFrame, dataset_dir: Path, folder: str):
+    """
+    Add `df`, the rows of `folder`, to the Parquet dataset at `dataset_dir`,
+    partitioned (Hive style) by questionnaire and username. Its files are
+    named after `folder`, and the ones a previous run of the same folder
+    wrote are deleted first, so re-running a folder never duplicates its
+    rows while other folders' rows, even in the same partitions, are left
+    as is. Rows whose file name doesn't parse go to the UNKNOWN_PARTITION.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    dataset_dir = Path(dataset_dir)
+    tag = _dataset_tag(folder)
+    for old in dataset_dir.glob(f"**/{tag}-*.parquet"):
+        old.unlink()
+    df = _arrow_ready(df)
+    df[PARTITION_COLS] = df[PARTITION_COLS].fillna(UNKNOWN_PARTITION)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(
+        table, str(dataset_dir), format="parquet",
+        partitioning=PARTITION_COLS, partitioning_flavor="hive",
+        basename_template=f"{tag}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+def build_transcript(whisper_jsonl: Path, output_csv: Path, output_xlsx: Path = None,
+                     report: RunReport = None, output_parquet: Path = None,
+                     dataset_dir: Path = None, index_db: Path = None):
+    """
+    Merge `whisper_jsonl` into a sorted table, write it as CSV and, if their
+    paths are given, as Excel and Parquet, add it to the partitioned Parquet
+    dataset at `dataset_dir` and upsert it into the `index_db` index (as
+    the rows of the JSONL's folder), and return it. With a `report`,
+    reading and each output are timed separately.
+    """
+    import pandas as pd
+    with stage(report, "read_jsonl"):
+        whisper = read_whisper_jsonl(whisper_jsonl)
+
+    parts = parse_filenames(whisper["audio_filepath"])
+    extra = ["duplicate_of"] if "duplicate_of" in whisper else []
+    df = pd.concat(
+        [whisper["audio_filepath"], parts, whisper[["duration", "transcript_whisper", *extra]]], axis=1
     )
-    # Sort so that e.g. 'GR_Survey' < 'PE_Inventory', and then by qnum
-    df = df.sort_values(['questionnaire', 'qnum'])
-    # Clean up helper column
-    df = df.drop(columns=['qnum'])
+
+    # Sort so that e.g. 'GR_Survey' < 'PE_Inventory', then by question number
+    # ('q2' < 'q16'); names that don't parse have no questionnaire and come first
+    df = df.sort_values(["questionnaire", "qnum", "audio_filepath"], kind="stable")
+    df = df.drop(columns=["qnum"]).reset_index(drop=True)
 
     # ensure dirs
-    args.output_csv.parent.mkdir(parents=True, exist_ok=True)
-    args.output_xlsx.parent.mkdir(parents=True, exist_ok=True)
+    outputs = [p for p in (output_csv, output_xlsx, output_parquet) if p is not None]
+    for path in outputs:
+        path.parent.mkdir(parents=True, exist_ok=True)
 
-    df.to_csv(args.output_csv, index=False, encoding="utf-8-sig")
-    df.to_excel(args.output_xlsx, index=False)
+    with stage(report, "write_csv"):
+        df.to_csv(output_csv, index=False, encoding="utf-8-sig")
+    if output_xlsx is not None:
+        with stage(report, "write_excel"):
+            if not write_excel(df, output_xlsx):
+                outputs.remove(output_xlsx)
+    if output_parquet is not None:
+        with stage(report, "write_parquet"):
+            write_parquet(df, output_parquet)
+    folder = str(Path(whisper_jsonl).resolve().parent)
+    if dataset_dir is not None:
+        with stage(report, "write_dataset"):
+            write_dataset(df, dataset_dir, folder)
+        outputs.append(dataset_dir)
+    if index_db is not None:
+        with stage(report, "update_index"), TranscriptIndex(index_db) as index:
+            index.upsert(df, folder=folder)
+        outputs.append(index_db)
 
-    print(f"✅ Wrote {len(df)} rows to {args.output_csv} and {args.output_xlsx}")
+    print(f"✅ Wrote {len(df)} rows to {' and '.join(map(str, outputs))}")
 
     # Identify all duplicate rows based on 'questionnaire' and 'question'
     duplicates = df[df.duplicated(subset=["questionnaire", "question"], keep=False)]
 
     # Write the duplicates to a CSV file for manual review
-    duplicates.to_csv(args.output_csv.with_name("duplicate_questions.csv"), index=False)
+    duplicates.to_csv(output_csv.with_name("duplicate_questions.csv"), index=False)
     print("Duplicate questions written to: manually_check_duplicate_questions.csv")
 
-    print(f"✅ Wrote {len(df)} rows to no_duplicates: {args.output_csv} and {args.output_xlsx}")
+    print(f"✅ Wrote {len(df)} rows to no_duplicates: {' and '.join(map(str, outputs))}")
+
+    return df
+
+def main():
+    args = parse_args()
+    build_transcript(
+        args.whisper_jsonl, args.output_csv, args.output_xlsx,
+        output_parquet=args.output_parquet, dataset_dir=args.dataset_dir,
+        index_db=args.index_db,
+    )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,14 +1,96 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
+import os
 import sys
 import subprocess
 import json
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def load_trim_map(map_path: Path) -> dict:
+SAMPLE_RATE = 16000  # Hz, what Whisper expects
+MANIFEST_NAME = ".convert_manifest.json"
+
+class TrimIndex(Mapping):
+    """
+    Read-only dict[str, float] of trim-map keys, compiled into an
+    Aho-Corasick automaton so that every key occurring in a filename is
+    found in one scan of the name, however many keys there are.
+    """
+
+    def __init__(self, trim_map=None):
+        self._map = dict(trim_map or {})
+        # trie: goto[state] = {char: state}; out[state] = keys ending there
+        self._goto = [{}]
+        self._out = [[]]
+        for key in self._map:
+            state = 0
+            for ch in key:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(key)
+
+        # failure links, breadth first, so out[] also holds the keys that
+        # are suffixes of the current match
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())  # depth 1 fails to the root
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __getitem__(self, key):
+        return self._map[key]
+
+    def __iter__(self):
+        return iter(self._map)
+
+    def __len__(self):
+        return len(self._map)
+
+    def matches(self, name: str) -> list:
+        """All keys occurring in `name`, longest first (ties in key order)."""
+        found = set()
+        state = 0
+        for ch in name:
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            found.update(self._out[state])
+        return sorted(found, key=lambda k: (-len(k), k))
+
+    def lookup(self, name: str):
+        """
+        Return (key, conflicts) for `name`: the longest key it contains
+        (None if none) and any other matching keys that are not part of
+        that key and ask for a different trim.
+        """
+        found = self.matches(name)
+        if not found:
+            return None, []
+        best = found[0]
+        conflicts = [
+            k for k in found[1:]
+            if k not in best and self._map[k] != self._map[best]
+        ]
+        return best, conflicts
+
+def load_trim_map(map_path: Path) -> TrimIndex:
     """
     Reads a two-column mapping file (key and seconds) and returns
-    a dict[str, float].
+    a TrimIndex (a read-only dict[str, float]).
     """
     trim_map = {}
     with map_path.open(encoding='utf-8') as f:
@@ -28,7 +110,385 @@ def load_trim_map(map_path: Path) -> dict:
                 continue
             trim_map[key] = sec
             print(f"  {key} → {sec}")
-    return trim_map
+    return TrimIndex(trim_map)
+
+def trim_samples(trim_seconds: float) -> int:
+    """
+    Number of 16 kHz samples dropped for a trim of `trim_seconds`.
+
+    Matches the old two-step path, where `-ss` on the intermediate WAV
+    seeked to the sample at that timestamp (trim_map values are exact at
+    16 kHz, so rounding only absorbs float noise).
+    """
+    return max(0, round(trim_seconds * SAMPLE_RATE))
+
+def ffmpeg_decode_cmd(webm_file: Path, trim_seconds: float, output) -> list:
+    """
+    Build a single ffmpeg call that decodes `webm_file`, resamples to
+    16 kHz mono s16 and drops the first `trim_seconds`, all in one pass.
+
+    `output` is a WAV path, or "-" to stream raw s16le PCM to stdout.
+    """
+    filters = [
+        "asetpts=PTS-STARTPTS",
+        f"aformat=sample_fmts=s16:sample_rates={SAMPLE_RATE}:channel_layouts=mono",
+    ]
+    n_trim = trim_samples(trim_seconds)
+    if n_trim:
+        # atrim counts samples after resampling, so the cut is sample-exact
+        filters += [f"atrim=start_sample={n_trim}", "asetpts=PTS-STARTPTS"]
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel", "error",
+        "-i", str(webm_file),
+        "-af", ",".join(filters),
+        "-acodec", "pcm_s16le",  # 16‐bit PCM
+        "-ar", str(SAMPLE_RATE),
+        "-ac", "1",  # mono
+    ]
+    if output == "-":
+        return cmd + ["-f", "s16le", "-"]
+    return cmd + ["-y", str(output)]
+
+def decode_to_array(webm_file: Path, trim_seconds: float = 0.0, dtype: str = "float32"):
+    """
+    Decode and trim `webm_file` straight into memory, with no WAV on disk.
+
+    Returns a float32 NumPy array in [-1, 1) at 16 kHz, identical to
+    reading the `{stem}.wav` that `convert_file` would write, or with
+    `dtype="int16"` the raw PCM samples of that file.
+    """
+    import numpy as np
+
+    proc = subprocess.run(
+        ffmpeg_decode_cmd(webm_file, trim_seconds, "-"),
+        check=True, stdout=subprocess.PIPE,
+    )
+    pcm = np.frombuffer(proc.stdout, dtype="<i2")
+    if dtype == "int16":
+        return pcm
+    return pcm.astype(np.float32) / 32768.0
+
+def find_trim(webm_file: Path, trim_map: Mapping, log=None) -> float:
+    """
+    Return the trim in seconds for `webm_file` (0.0 if no key matches).
+
+    The longest key contained in the filename wins, so `GR_Survey_q1` can
+    never shadow `GR_Survey_q11` whatever order the keys are listed in.
+    A plain dict is accepted too, but is compiled on every call.
+    """
+    if not isinstance(trim_map, TrimIndex):
+        trim_map = TrimIndex(trim_map)
+    key, conflicts = trim_map.lookup(webm_file.name)
+    if key is None:
+        if log:
+            log(f"  ⚠️  No trim-map key matches {webm_file.name}; not trimming", err=True)
+        return 0.0
+    sec = trim_map[key]
+    if log:
+        log(f"  ✅ Match '{key}' → Trim {sec}s")
+        if conflicts:
+            others = ", ".join(f"'{k}' ({trim_map[k]}s)" for k in conflicts)
+            log(f"  ⚠️  Ambiguous trim for {webm_file.name}: also matches {others}", err=True)
+    return sec
+
+def convert_file(webm_file: Path, out_dir: Path, trim_map: Mapping, log=None,
+                 two_pass: bool = False) -> bool:
+    """
+    Convert one .webm to a trimmed 16 kHz mono WAV in `out_dir`.
+
+    Messages go through `log(msg, err=False)` (printing by default) so that
+    parallel workers can buffer them. Returns True on success; ffmpeg
+    failures are reported and isolated to this file.
+    """
+    if log is None:
+        def log(msg, err=False):
+            print(msg, file=sys.stderr if err else sys.stdout)
+
+    log(f"🔍 Checking file: {webm_file.name}")
+    trim_seconds = find_trim(webm_file, trim_map, log)
+    final_out = out_dir / f"{webm_file.stem}.wav"
+
+    if not two_pass:
+        log(f"  🎧 Converting → {final_out.name} (16 kHz mono, trim {trim_seconds}s)")
+        try:
+            subprocess.run(ffmpeg_decode_cmd(webm_file, trim_seconds, final_out), check=True)
+        except subprocess.CalledProcessError as e:
+            log(f"❌ ffmpeg conversion failed on {webm_file.name}: {e}", err=True)
+            return False
+        log("")
+        return True
+
+    temp_wav = out_dir / f"{webm_file.stem}_full.wav"
+
+    # ─── Step 1: Convert .webm → 16 kHz mono WAV (full length)
+    log(f"  🎧 Step 1: Converting → {temp_wav.name} (16 kHz mono, full length)")
+    cmd_convert = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel", "error",
+        "-i", str(webm_file),
+        "-acodec", "pcm_s16le",  # 16‐bit PCM WAV
+        "-ar", "16000",  # 16 kHz sample rate
+        "-ac", "1",  # mono
+        str(temp_wav)
+    ]
+    try:
+        subprocess.run(cmd_convert, check=True)
+    except subprocess.CalledProcessError as e:
+        log(f"❌ ffmpeg conversion failed on {webm_file.name}: {e}", err=True)
+        return False
+
+    # ─── Step 2: Trim the intermediate WAV to final WAV
+    if trim_seconds > 0:
+        log(f"  🎧 Step 2: Trimming first {trim_seconds}s from {temp_wav.name} → {final_out.name}")
+        cmd_trim = [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel", "error",
+            "-ss", str(trim_seconds),
+            "-i", str(temp_wav),
+            "-c", "copy",      # copy PCM chunks into final WAV
+            str(final_out)
+        ]
+    else:
+        # No trimming requested; rename the full WAV to final
+        temp_wav.rename(final_out)
+        log(f"  ℹ️  No trim; renamed {temp_wav.name} → {final_out.name}")
+        cmd_trim = None
+
+    if cmd_trim:
+        try:
+            subprocess.run(cmd_trim, check=True)
+        except subprocess.CalledProcessError as e:
+            log(f"❌ ffmpeg trimming failed on {temp_wav.name}: {e}", err=True)
+            return False
+
+    # ─── Remove the intermediate WAV
+    try:
+        temp_wav.unlink()
+        log(f"  🗑 Removed intermediate file: {temp_wav.name}")
+    except OSError:
+        pass
+
+    log("")
+    return True
+
+def ffmpeg_params(two_pass: bool = False) -> dict:
+    """The conversion settings recorded in the manifest; a change forces a redo."""
+    return {
+        "codec": "pcm_s16le",
+        "sample_rate": SAMPLE_RATE,
+        "channels": 1,
+        "mode": "two-pass" if two_pass else "single-pass",
+    }
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_manifest(out_dir: Path) -> dict:
+    """Return the {webm name: entry} manifest of `out_dir` (empty if missing or unreadable)."""
+    path = out_dir / MANIFEST_NAME
+    try:
+        with path.open(encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+def save_manifest(out_dir: Path, entries: dict):
+    """Write the manifest atomically, so an interrupted run never leaves it half-written."""
+    path = out_dir / MANIFEST_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({"version": 1, "files": entries}, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def manifest_entry(webm_file: Path, trim_seconds: float, params: dict,
+                   use_hash: bool = False) -> dict:
+    """Describe the source file and the settings it is (about to be) converted with."""
+    st = webm_file.stat()
+    entry = {
+        "output": f"{webm_file.stem}.wav",
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "trim_seconds": trim_seconds,
+        "ffmpeg": params,
+    }
+    if use_hash:
+        entry["sha256"] = _file_sha256(webm_file)
+    return entry
+
+def is_up_to_date(old: dict, webm_file: Path, out_dir: Path, trim_seconds: float,
+                  params: dict, use_hash: bool = False) -> bool:
+    """
+    True if `old` (the manifest entry from the previous run) still matches
+    the source, its trim and the ffmpeg settings, and the output exists.
+
+    With `use_hash`, a changed mtime alone does not trigger a redo as long
+    as the content hash is the same.
+    """
+    if not old or old.get("trim_seconds") != trim_seconds or old.get("ffmpeg") != params:
+        return False
+    if not (out_dir / old.get("output", "")).is_file():
+        return False
+    st = webm_file.stat()
+    if old.get("size") != st.st_size:
+        return False
+    if use_hash:
+        return old.get("sha256") == _file_sha256(webm_file)
+    return old.get("mtime_ns") == st.st_mtime_ns
+
+def remove_stale(out_dir: Path, entries: dict, sources: set, log=print) -> int:
+    """Delete outputs whose source .webm is gone and drop them from `entries`."""
+    removed = 0
+    for name in sorted(set(entries) - sources):
+        out = out_dir / entries.pop(name).get("output", "")
+        try:
+            out.unlink()
+            log(f"🗑 Removed stale output: {out.name}")
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+def _convert_buffered(webm_file: Path, out_dir: Path, trim_map: Mapping, two_pass: bool = False):
+    """Run `convert_file` collecting its messages instead of printing them."""
+    messages = []
+    ok = convert_file(
+        webm_file, out_dir, trim_map,
+        log=lambda msg, err=False: messages.append((msg, err)),
+        two_pass=two_pass,
+    )
+    return ok, messages
+
+def wav_dir_for(target_dir: Path) -> Path:
+    """The `{prefix}_wav` directory the converted files of `target_dir` go to."""
+    return target_dir / f"{target_dir.name}_wav"
+
+def _ordered_map(pool, fn, items, ahead: int):
+    """
+    Like `pool.map`, but with at most `ahead` calls submitted and not yet
+    consumed, so a slow consumer holds back new work instead of queueing it.
+    """
+    pending = deque()
+    items = iter(items)
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= ahead:
+            break
+    while pending:
+        yield pending.popleft().result()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            break
+
+def iter_convert_folder(target_dir: Path, trim_map: Mapping, jobs: int = 1, two_pass: bool = False,
+                        force: bool = False, use_hash: bool = False):
+    """
+    Convert every new or changed .webm in `target_dir` into `{prefix}_wav`,
+    yielding (webm_file, wav_path, status) in name order as each file is
+    ready; status is "converted", "up-to-date" or "failed".
+
+    `jobs` files are converted at once (0 = one per CPU core), never more
+    than 2 × jobs ahead of the consumer. The manifest is saved when the
+    generator finishes or is closed. Raises FileNotFoundError if
+    `target_dir` doesn't exist.
+    """
+    # ─── 1. Prepare output directory
+    if not target_dir.is_dir():
+        raise FileNotFoundError(f"Directory not found: {target_dir}")
+    out_dir = wav_dir_for(target_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # ─── 2. Work out what changed since the last run
+    webm_files = sorted(target_dir.glob("*.webm"), key=lambda p: p.name)
+    params = ffmpeg_params(two_pass)
+    manifest = {} if force else load_manifest(out_dir)
+    remove_stale(out_dir, manifest, {f.name for f in webm_files})
+
+    todo, trims = [], {}
+    for webm_file in webm_files:
+        trims[webm_file.name] = find_trim(webm_file, trim_map)
+        if is_up_to_date(manifest.get(webm_file.name), webm_file, out_dir,
+                         trims[webm_file.name], params, use_hash):
+            continue
+        todo.append(webm_file)
+    skipped = len(webm_files) - len(todo)
+    if skipped:
+        print(f"⏭  {skipped} files unchanged since the last run, skipping")
+        print()
+
+    # ─── 3. Process each new or changed .webm
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+
+    def record(webm_file, ok):
+        if ok:
+            manifest[webm_file.name] = manifest_entry(
+                webm_file, trims[webm_file.name], params, use_hash
+            )
+        else:
+            manifest.pop(webm_file.name, None)
+        return out_dir / f"{webm_file.stem}.wav", "converted" if ok else "failed"
+
+    pool = None
+    try:
+        if jobs == 1:
+            # lazy, so each file is converted only once the previous one is consumed
+            results = ((convert_file(f, out_dir, trim_map, two_pass=two_pass), []) for f in todo)
+        else:
+            # ffmpeg does the heavy lifting in its own process, so threads are
+            # enough to keep `jobs` conversions running at once. Messages are
+            # replayed per file, in the same order as the serial path.
+            print(f"⚙️  Converting {len(todo)} files with {jobs} parallel jobs")
+            print()
+            pool = ThreadPoolExecutor(max_workers=jobs)
+            results = _ordered_map(
+                pool, lambda f: _convert_buffered(f, out_dir, trim_map, two_pass), todo, 2 * jobs
+            )
+        todo_set = set(todo)
+        for webm_file in webm_files:
+            if webm_file not in todo_set:
+                yield webm_file, out_dir / manifest[webm_file.name]["output"], "up-to-date"
+                continue
+            ok, messages = next(results)
+            for msg, err in messages:
+                print(msg, file=sys.stderr if err else sys.stdout)
+            yield (webm_file, *record(webm_file, ok))
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        save_manifest(out_dir, manifest)
+
+def convert_folder(target_dir: Path, trim_map: Mapping, jobs: int = 1, two_pass: bool = False,
+                   force: bool = False, use_hash: bool = False) -> list:
+    """
+    Convert every new or changed .webm in `target_dir` into `{prefix}_wav`
+    (see `iter_convert_folder`). Returns the names of the files that failed.
+    """
+    counts = {"converted": 0, "up-to-date": 0, "failed": 0}
+    failed = []
+    for webm_file, _, status in iter_convert_folder(
+        target_dir, trim_map, jobs=jobs, two_pass=two_pass, force=force, use_hash=use_hash
+    ):
+        counts[status] += 1
+        if status == "failed":
+            failed.append(webm_file.name)
+    print_summary(counts, failed)
+    return failed
+
+def print_summary(counts: dict, failed: list):
+    """Print the per-status `counts` of a conversion run and the names of the `failed` files."""
+    attempted = counts["converted"] + counts["failed"]
+    print(f"📊 Converted {counts['converted']}/{attempted} files ({counts['up-to-date']} up to date)")
+    if failed:
+        print(f"❌ {len(failed)} failed:", file=sys.stderr)
+        for name in failed:
+            print(f"  - {name}", file=sys.stderr)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -45,6 +505,27 @@ def main():
         default="trim_map.txt",
         help="Name (or path) of the trim-map file (default: trim_map.txt)"
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Number of files to convert concurrently (default: 1, 0 = one per CPU core)"
+    )
+    parser.add_argument(
+        "--two-pass",
+        action="store_true",
+        help="Use the legacy decode-then-trim path with an intermediate {stem}_full.wav"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reconvert every file, ignoring the manifest from previous runs"
+    )
+    parser.add_argument(
+        "--hash",
+        action="store_true",
+        help="Detect changed inputs by content hash instead of size/mtime"
+    )
     args = parser.parse_args()
 
     # ─── 1. Validate target directory
@@ -72,78 +553,13 @@ def main():
     trim_map = load_trim_map(map_path)
     print()
 
-    # ─── 3. Prepare output directory
-    prefix = target_dir.name
-    out_dir = target_dir / f"{prefix}_wav"
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    # ─── 4. Process each .webm
-    for webm_file in sorted(target_dir.glob("*.webm"), key=lambda p: p.name):
-        print(f"🔍 Checking file: {webm_file.name}")
-        trim_seconds = 0.0
-        for key, sec in trim_map.items():
-            if key in webm_file.name:
-                trim_seconds = sec
-                print(f"  ✅ Match '{key}' → Trim {trim_seconds}s")
-                break
-
-        stem = webm_file.stem
-        temp_wav = out_dir / f"{stem}_full.wav"
-        final_out = out_dir / f"{stem}.wav"
-
-        # ─── Step 1: Convert .webm → 16 kHz mono WAV (full length)
-        print(f"  🎧 Step 1: Converting → {temp_wav.name} (16 kHz mono, full length)")
-        cmd_convert = [
-            "ffmpeg",
-            "-hide_banner",
-            "-loglevel", "error",
-            "-i", str(webm_file),
-            "-acodec", "pcm_s16le",  # 16‐bit PCM WAV
-            "-ar", "16000",  # 16 kHz sample rate
-            "-ac", "1",  # mono
-            str(temp_wav)
-        ]
-        try:
-            subprocess.run(cmd_convert, check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"❌ ffmpeg conversion failed on {webm_file.name}: {e}", file=sys.stderr)
-            continue
-
-        # ─── Step 2: Trim the intermediate WAV to final WAV
-        if trim_seconds > 0:
-            print(f"  🎧 Step 2: Trimming first {trim_seconds}s from {temp_wav.name} → {final_out.name}")
-            cmd_trim = [
-                "ffmpeg",
-                "-hide_banner",
-                "-loglevel", "error",
-                "-ss", str(trim_seconds),
-                "-i", str(temp_wav),
-                "-c", "copy",      # copy PCM chunks into final WAV
-                str(final_out)
-            ]
-        else:
-            # No trimming requested; rename the full WAV to final
-            temp_wav.rename(final_out)
-            print(f"  ℹ️  No trim; renamed {temp_wav.name} → {final_out.name}")
-            cmd_trim = None
-
-        if cmd_trim:
-            try:
-                subprocess.run(cmd_trim, check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"❌ ffmpeg trimming failed on {temp_wav.name}: {e}", file=sys.stderr)
-                continue
-
-        # ─── Remove the intermediate WAV
-        try:
-            temp_wav.unlink()
-            print(f"  🗑 Removed intermediate file: {temp_wav.name}")
-        except OSError:
-            pass
-
-        print()
+    # ─── 3. Convert
+    convert_folder(
+        target_dir, trim_map, jobs=args.jobs, two_pass=args.two_pass,
+        force=args.force, use_hash=args.hash,
+    )
 
     print("✅ All done.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,163 @@
+"""
+Timing and resource measurements for a pipeline run, written as a JSON report.
+
+A `RunReport` collects wall and CPU time per stage, per-file and per-batch
+model timings, cache counters and peak memory. `run_pipeline` and
+`whisper_transcribe` write it next to `whisper_output.jsonl` (see
+`report_path_for`). `profiled()` wraps a block in cProfile on request
+(`--profile`); sampling profilers need no hook at all, e.g.
+`py-spy record -o prof.svg -- python run_pipeline.py DIR`.
+"""
+import contextlib
+import cProfile
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+def peak_rss_mb(children: bool = False):
+    """
+    Peak resident memory in MB of this process (or, with `children`, of
+    its largest finished child process); None where it can't be measured.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        if children:
+            return None
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2**20
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def report_path_for(output_jsonl: Path) -> Path:
+    """Where the run report for `output_jsonl` goes: `{stem}_report.json` beside it."""
+    output_jsonl = Path(output_jsonl)
+    return output_jsonl.with_name(f"{output_jsonl.stem}_report.json")
+
+def _percentile(values, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+class RunReport:
+    """Measurements of one run; `meta` is stored as-is (command, model, options...)."""
+
+    def __init__(self, **meta):
+        self.meta = meta
+        self.started = time.time()
+        self.stages = []
+        self.files = []
+        self.batches = []
+        self.stats = {}
+        self._open = []  # names of the stages being timed, outermost first
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **info):
+        """
+        Time the enclosed block as stage `name`. The yielded dict is stored
+        with the stage, so the block can add fields (e.g. a file count).
+        Stages opened inside another one record it as their "parent".
+        """
+        parent = self._open[-1] if self._open else None
+        self._open.append(name)
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield info
+        finally:
+            self._open.pop()
+            entry = {
+                "name": name,
+                "wall_seconds": time.perf_counter() - t0,
+                "cpu_seconds": time.process_time() - c0,
+            }
+            if parent is not None:
+                entry["parent"] = parent
+            self.stages.append({**entry, **info})
+
+    def add_file(self, path, **fields):
+        self.files.append({"path": str(path), **fields})
+
+    def add_batch(self, chunks: int, seconds: float, audio_seconds: float):
+        self.batches.append({"chunks": chunks, "seconds": seconds, "audio_seconds": audio_seconds})
+
+    def add_stats(self, stats: dict):
+        """Accumulate the counters filled in by `whisper_transcribe.transcribe_files`."""
+        for key, value in stats.items():
+            self.stats[key] = self.stats.get(key, 0) + value
+
+    def summary(self) -> dict:
+        audio_s = self.stats.get("audio_seconds", 0)
+        model_s = self.stats.get("model_seconds", 0)
+        lookups = self.stats.get("cache_hits", 0) + self.stats.get("cache_misses", 0)
+        per_chunk = [b["seconds"] / b["chunks"] for b in self.batches if b["chunks"]]
+        load = [f["load_seconds"] for f in self.files if "load_seconds" in f]
+        return {
+            "wall_seconds": sum(s["wall_seconds"] for s in self.stages if "parent" not in s),
+            # records written, so empty and duplicate takes count too; the
+            # model's own "files" include an escalated take twice
+            "files": self.stats.get("written", self.stats.get("files", len(self.files))),
+            "chunks": self.stats.get("chunks", 0),
+            "duplicates": self.stats.get("duplicates", 0),
+            "routed_empty": self.stats.get("routed_empty", 0),
+            "routed_fast": self.stats.get("routed_fast", 0),
+            "escalated": self.stats.get("escalated", 0),
+            "saved_seconds": self.stats.get("saved_seconds", 0),
+            "audio_seconds": audio_s,
+            "model_seconds": model_s,
+            "real_time_factor": model_s / audio_s if audio_s else None,
+            "cache_hit_rate": self.stats.get("cache_hits", 0) / lookups if lookups else None,
+            "chunk_seconds_p50": _percentile(per_chunk, 50),
+            "chunk_seconds_p95": _percentile(per_chunk, 95),
+            "load_seconds_total": sum(load),
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_mb_children": peak_rss_mb(children=True),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started)),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "meta": self.meta,
+            "summary": self.summary(),
+            "stages": self.stages,
+            "files": self.files,
+            "batches": self.batches,
+        }
+
+    def write(self, path: Path) -> Path:
+        """Write the report as JSON to `path` (atomically) and return the path."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(self.to_dict(), indent=2, default=str), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+def stage(report: RunReport, name: str, **info):
+    """`report.stage(name)`, or a no-op block when there is no report."""
+    return report.stage(name, **info) if report is not None else contextlib.nullcontext(info)
+
+@contextlib.contextmanager
+def profiled(path: Path = None):
+    """Run the enclosed block under cProfile and dump the stats to `path`; no-op without a path."""
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(path))
+        print(f"🔬 Profile written to {path} (view with: python -m pstats {path})")
@@ -0,0 +1,29 @@
+"""
+Pre-ASR screen: how much speech a trimmed answer holds, before any model runs.
+
+Speech is measured with the same vectorized RMS-energy detector as --vad
+(`vad.speech_segments`). Takes with (almost) no speech never reach a
+model and come out with an empty transcript, which `validate_responses`
+flags; short takes, which can hardly reach `validate_responses.MIN_WORDS`,
+go to a small fast model; everything else goes to the large one.
+"""
+import vad as vad_mod
+
+# speech_segments pads every segment by PAD_S on both sides, so a lone
+# click already measures ~0.5 s
+EMPTY_SPEECH_S = 0.6  # less speech than this: no model at all
+SHORT_SPEECH_S = 4.0  # less than this (≈ 10 words at a normal pace): the fast model
+
+ROUTES = ("empty", "fast", "full")
+
+def speech_seconds(samples, sr: int) -> float:
+    """Seconds of detected speech in `samples`."""
+    return vad_mod.speech_seconds(vad_mod.speech_segments(samples, sr), sr)
+
+def route(speech_s: float) -> str:
+    """"empty", "fast" or "full" for a take with `speech_s` seconds of speech."""
+    if speech_s < EMPTY_SPEECH_S:
+        return "empty"
+    if speech_s < SHORT_SPEECH_S:
+        return "fast"
+    return "full"
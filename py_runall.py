@@ -1,15 +1,6 @@
-import subprocess
 from pathlib import Path
 
-def run_pipeline_on_folder(folder: Path):
-    print(f"\n=== Running pipeline on: {folder} ===")
-    try:
-        subprocess.run(
-            ["python", "run_pipeline.py", str(folder)],
-            check=True
-        )
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Pipeline failed for {folder}: {e}")
+import run_pipeline
 
 def main():
     base_dir = Path(r"D:\Usuarios\MGIALOU\Desktop\ToProcess")
@@ -18,8 +9,8 @@ def main():
 
     subfolders = [f for f in base_dir.iterdir() if f.is_dir() and f in include_dir]
 
-    for folder in sorted(subfolders):
-        run_pipeline_on_folder(folder)
+    # One process and one loaded model for all folders
+    run_pipeline.run_folders(sorted(subfolders), Path("trim_map.txt").resolve())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
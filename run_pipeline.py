@@ -1,61 +1,292 @@
 #!/usr/bin/env python3
-import subprocess
+import argparse
+import queue
 import sys
+import threading
 from pathlib import Path
 
-def run_cmd(cmd):
-    """Run a shell command, raising an exception on failure."""
-    print(f"\n▶ Running: {cmd}")
-    subprocess.run(cmd, shell=True, check=True)
+import build_transcript
+import convert_and_trim
+import validate_responses
+import whisper_transcribe
+from asr_backends import BACKENDS, build_backend
+from audio_fingerprint import DEFAULT_DB_PATH as DEFAULT_FINGERPRINT_DB, FingerprintDB
+from instrumentation import RunReport, profiled, report_path_for
+from transcript_cache import DEFAULT_CACHE_PATH, TranscriptCache
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: run_pipeline.py TARGET_DIR [MAP_FILE] [--validate-column COLUMN]", file=sys.stderr)
-        sys.exit(1)
+def folder_outputs(target_dir: Path) -> dict:
+    """Paths of everything the pipeline reads or writes for `target_dir`."""
+    code = target_dir.name[:5]
+    csv_path = target_dir / f"{code}_transcripts.csv"
+    whisper_json = target_dir / "whisper_output.jsonl"
+    return {
+        "wav_dir": convert_and_trim.wav_dir_for(target_dir),
+        "whisper_json": whisper_json,
+        "report": report_path_for(whisper_json),
+        "csv": csv_path,
+        "xlsx": target_dir / f"{code}_transcripts.xlsx",
+        "parquet": target_dir / f"{code}_transcripts.parquet",
+        "validated_csv": csv_path.with_name(csv_path.stem + "_validated.csv"),
+    }
 
-    target_dir = Path(sys.argv[1]).resolve()
-    map_file   = Path(sys.argv[2] if len(sys.argv) > 2 else "trim_map.txt").resolve()
+_DONE = object()
 
-    # Step 1: Convert & trim to WAV + generate manifest
-    run_cmd(f"python convert_and_trim.py {target_dir} {map_file}")
+def stream_converted(target_dir: Path, trim_map, jobs: int = 1, queue_size: int = 8,
+                     counts: dict = None, failed: list = None):
+    """
+    Convert `target_dir` in a background thread and yield each WAV as soon
+    as it is ready. At most `queue_size` finished WAVs wait for the consumer;
+    beyond that the converter blocks, so decoding never runs far ahead of
+    transcription. Conversion errors are re-raised here. Files are counted
+    per status into `counts` and failed ones named in `failed`, if given;
+    both are complete once the generator is exhausted.
+    """
+    ready = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    if counts is None:
+        counts = {}
+    if failed is None:
+        failed = []
 
-    prefix  = target_dir.name
-    wav_dir = target_dir / f"{prefix}_wav"
-    if not wav_dir.is_dir():
-        print(f"❌ Expected wav_dir at {wav_dir}, but it doesn’t exist.")
-        sys.exit(1)
+    def produce():
+        try:
+            for webm_file, wav, status in convert_and_trim.iter_convert_folder(target_dir, trim_map, jobs=jobs):
+                if stop.is_set():
+                    break
+                counts[status] = counts.get(status, 0) + 1
+                if status == "failed":
+                    failed.append(webm_file.name)
+                else:
+                    ready.put(wav)
+        except BaseException as e:
+            ready.put(e)
+        finally:
+            ready.put(_DONE)
 
-    # Prepare paths
-    code = prefix[:5]
-    csv_path = target_dir / f"{code}_transcripts.csv"
-    xlsx_path = target_dir / f"{code}_transcripts.xlsx"
+    producer = threading.Thread(target=produce, name="convert", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = ready.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # if the consumer stopped early, unblock the converter so it can
+        # finish its current file and save the manifest
+        stop.set()
+        while producer.is_alive():
+            try:
+                ready.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        producer.join()
 
-    # 3) Run Whisper on the same WAVs
-    whisper_json = target_dir / "whisper_output.jsonl"
-    run_cmd(f"python whisper_transcribe.py {wav_dir} --output_jsonl {whisper_json}")
-
-    # Step 4: Build CSV/Excel from ASR JSON
-    run_cmd(
-        "python build_transcript.py "
-        f"--whisper_jsonl {whisper_json} "
-        f"--output_csv   {csv_path} "
-        f"--output_xlsx  {xlsx_path}"
+def run_folder(target_dir: Path, trim_map, pipe, cache: TranscriptCache = None, jobs: int = 1,
+               validate_column: str = "transcript_whisper", resume: bool = False,
+               stream: bool = False, queue_size: int = 8, excel: bool = True,
+               parquet: bool = False, dataset_dir: Path = None, index_db: Path = None,
+               fast_pipe=None, fingerprints: FingerprintDB = None,
+               fingerprint_config: dict = None, **options) -> dict:
+    """
+    Run every stage on one folder in this process, with an already loaded
+    `pipe` (and optionally `cache`); `options` go to `transcribe_files`.
+
+    With `stream`, conversion and transcription overlap: each WAV goes
+    through a bounded queue of `queue_size` into the model and the JSONL
+    as soon as it is converted. With `fast_pipe`, takes are pre-screened:
+    empty ones skip the model and short ones go to `fast_pipe`. With
+    `fingerprints`, identical or near-identical recordings (also from
+    earlier folders) are transcribed once, under `fingerprint_config`.
+    The table is written as CSV plus, as
+    selected, Excel, Parquet, a share of the partitioned `dataset_dir` and
+    rows of the cross-folder `index_db`.
+    Stage timings are written to the run report next to the JSONL.
+    Returns the output paths (None for outputs not written); raises
+    FileNotFoundError if `target_dir` doesn't exist.
+    """
+    target_dir = Path(target_dir).resolve()
+    if not target_dir.is_dir():
+        raise FileNotFoundError(f"Directory not found: {target_dir}")
+    paths = folder_outputs(target_dir)
+    if not excel:
+        paths["xlsx"] = None
+    if not parquet:
+        paths["parquet"] = None
+    report = RunReport(
+        command="run_pipeline", target_dir=target_dir, jobs=jobs, stream=stream,
+        resume=resume, **options,
     )
+    stats = {}
+
+    if stream:
+        # Steps 1+2: Convert & transcribe, overlapped
+        print(f"\n▶ Converting and transcribing {target_dir}")
+        with report.stage("convert+transcribe") as info:
+            counts = {"converted": 0, "up-to-date": 0, "failed": 0}
+            failed = []
+            wavs = stream_converted(target_dir, trim_map, jobs=jobs, queue_size=queue_size,
+                                    counts=counts, failed=failed)
+            if resume:
+                done = whisper_transcribe.drop_outdated(paths["whisper_json"])
+                # checked as each WAV arrives, i.e. after any re-conversion
+                wavs = (wav for wav in wavs if not whisper_transcribe.is_done(wav, done))
+            transcribe, transcribe_fast = whisper_transcribe.transcribers(
+                pipe, fast_pipe, cache=cache, report=report, **options
+            )
+            info["files"] = whisper_transcribe.transcribe_to_jsonl(
+                transcribe, wavs, paths["whisper_json"], append=resume, stats=stats,
+                report=report, transcribe_fast=transcribe_fast, fingerprints=fingerprints,
+                fingerprint_config=fingerprint_config,
+            )
+            if resume:
+                # records replaced above, or of outputs removed as stale meanwhile
+                whisper_transcribe.drop_outdated(paths["whisper_json"])
+            convert_and_trim.print_summary(counts, failed)
+            info["failed"] = len(failed)
+    else:
+        # Step 1: Convert & trim to WAV
+        print(f"\n▶ Converting {target_dir}")
+        with report.stage("convert") as info:
+            info["failed"] = len(convert_and_trim.convert_folder(target_dir, trim_map, jobs=jobs))
+        if not paths["wav_dir"].is_dir():
+            raise FileNotFoundError(f"Expected wav_dir at {paths['wav_dir']}, but it doesn’t exist.")
 
-    # 5) Validate responses
-    validate_col = "transcript_whisper"
-    validated_csv = target_dir / f"transcripts_validated.csv"
-    run_cmd(
-        f"python validate_responses.py "
-        f"{csv_path} "
-        f"--column {validate_col}"
+        # Step 2: Run Whisper on the WAVs
+        print(f"\n▶ Transcribing {paths['wav_dir']}")
+        with report.stage("transcribe") as info:
+            info["files"] = whisper_transcribe.transcribe_folder(
+                pipe, paths["wav_dir"], paths["whisper_json"], resume=resume, cache=cache,
+                stats=stats, report=report, fast_pipe=fast_pipe, fingerprints=fingerprints,
+                fingerprint_config=fingerprint_config, **options
+            )
+    report.add_stats(stats)
+
+    # Step 3: Build CSV/Excel from ASR JSON
+    print(f"\n▶ Building {paths['csv']}")
+    with report.stage("build_transcript"):
+        build_transcript.build_transcript(
+            paths["whisper_json"], paths["csv"], paths["xlsx"], report=report,
+            output_parquet=paths["parquet"], dataset_dir=dataset_dir, index_db=index_db,
+        )
+    if paths["xlsx"] is not None and not paths["xlsx"].is_file():
+        paths["xlsx"] = None  # skipped, too long for Excel without xlsxwriter
+
+    # Step 4: Validate responses
+    print(f"\n▶ Validating {paths['csv']}")
+    with report.stage("validate"):
+        validate_responses.validate_csv(paths["csv"], validate_column)
+
+    report.write(paths["report"])
+    print(f"\n📈 Run report: {paths['report']}")
+    return paths
+
+def run_folders(folders, map_file: Path, model_id: str = None, backend: str = "transformers",
+                cache_path: Path = DEFAULT_CACHE_PATH, fingerprint_db: Path = None,
+                fast_model: str = None, **kwargs) -> list:
+    """
+    Run the pipeline on each of `folders`, loading the trim map, the model
+    (`model_id` on the `backend` ASR engine), the cache, the `fast_model`
+    for pre-screened short takes and, to transcribe duplicate recordings
+    once, the `fingerprint_db` once for all of them. A failing folder is
+    reported and skipped. `kwargs` go to `run_folder`; returns the folders
+    that failed.
+    """
+    trim_map = convert_and_trim.load_trim_map(Path(map_file))
+    pipe = build_backend(backend, model_id)
+    if fast_model is not None:
+        kwargs["fast_pipe"] = build_backend(backend, fast_model)
+    cache = TranscriptCache(cache_path) if cache_path else None
+    if fingerprint_db is not None:
+        kwargs["fingerprints"] = FingerprintDB(fingerprint_db)
+        kwargs["fingerprint_config"] = whisper_transcribe.dedup_config(
+            backend, model_id, kwargs.get("vad", False), fast_model
+        )
+    failed = []
+    try:
+        for folder in folders:
+            print(f"\n=== Running pipeline on: {folder} ===")
+            try:
+                paths = run_folder(folder, trim_map, pipe, cache=cache, **kwargs)
+            except Exception as e:
+                print(f"❌ Pipeline failed for {folder}: {e}", file=sys.stderr)
+                failed.append(folder)
+                continue
+            outputs = [paths[key] for key in ("csv", "xlsx", "parquet") if paths[key]]
+            print("\n✅ Pipeline complete. Outputs:" + "".join(f"\n  - {out}" for out in outputs))
+            print(f"→ Validation results: {paths['validated_csv']}")
+    finally:
+        if cache is not None:
+            cache.close()
+        if fingerprint_db is not None:
+            kwargs["fingerprints"].close()
+    return failed
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Convert, transcribe, tabulate and validate one folder of recordings."
     )
+    p.add_argument("target_dir", type=Path, help="Folder containing the .webm files")
+    p.add_argument("map_file", type=Path, nargs="?", default=Path("trim_map.txt"),
+                   help="Trim-map file (default: trim_map.txt)")
+    p.add_argument("--validate-column", default="transcript_whisper",
+                   help="Transcript column to validate (default: transcript_whisper)")
+    p.add_argument("-j", "--jobs", type=int, default=1,
+                   help="Parallel ffmpeg conversions (default: 1)")
+    p.add_argument("--batch-size", type=int, default=1,
+                   help="Chunks per model call (default: 1)")
+    p.add_argument("--backend", choices=sorted(BACKENDS), default="transformers",
+                   help="ASR engine (default: transformers)")
+    p.add_argument("--model-id", default=None,
+                   help="Model id or path (default: the backend's large-v3)")
+    p.add_argument("--vad", action="store_true",
+                   help="Chunk on detected speech and skip silence")
+    p.add_argument("--prescreen", action="store_true",
+                   help="Skip the model for empty takes and send short ones to --fast-model")
+    p.add_argument("--fast-model", default="small",
+                   help="Model for short takes with --prescreen (default: small)")
+    p.add_argument("--dedup", action="store_true",
+                   help="Transcribe identical or near-identical recordings once, across folders too")
+    p.add_argument("--fingerprint-db", type=Path, default=DEFAULT_FINGERPRINT_DB,
+                   help=f"Fingerprints of recordings seen so far (default: {DEFAULT_FINGERPRINT_DB})")
+    p.add_argument("--stream", action="store_true",
+                   help="Transcribe each WAV as soon as it is converted")
+    p.add_argument("--queue-size", type=int, default=8,
+                   help="Converted WAVs allowed to wait for the model in --stream mode (default: 8)")
+    p.add_argument("--resume", action="store_true",
+                   help="Keep existing whisper_output.jsonl records")
+    p.add_argument("--no-cache", action="store_true",
+                   help="Do not use the transcript cache")
+    p.add_argument("--no-excel", action="store_true",
+                   help="Skip the Excel copy of the transcript table")
+    p.add_argument("--parquet", action="store_true",
+                   help="Also write the transcript table as Parquet")
+    p.add_argument("--dataset-dir", type=Path, default=None,
+                   help="Add the table to this Parquet dataset, partitioned by questionnaire/username")
+    p.add_argument("--index-db", type=Path, default=None,
+                   help="Upsert the table into this cross-folder SQLite index")
+    p.add_argument("--profile", type=Path, default=None,
+                   help="Write cProfile stats of the run to this file")
+    args = p.parse_args()
 
+    with profiled(args.profile):
+        failed = run_folders(
+            [args.target_dir.resolve()], args.map_file.resolve(),
+            model_id=args.model_id, backend=args.backend,
+            cache_path=None if args.no_cache else DEFAULT_CACHE_PATH,
+            fingerprint_db=args.fingerprint_db if args.dedup else None,
+            fast_model=args.fast_model if args.prescreen else None,
+            jobs=args.jobs, validate_column=args.validate_column, resume=args.resume,
+            stream=args.stream, queue_size=max(1, args.queue_size),
+            excel=not args.no_excel, parquet=args.parquet, dataset_dir=args.dataset_dir,
+            index_db=args.index_db,
+            batch_size=max(1, args.batch_size), vad=args.vad,
+        )
+    if failed:
+        sys.exit(1)
     print("\n✅ Full pipeline complete.")
-    print(f"→ Combined transcripts: {csv_path}, {xlsx_path}")
-    print(f"→ Validation results: {validated_csv}")
-
-    print(f"\n✅ Pipeline complete. Outputs:\n  - {csv_path}\n  - {xlsx_path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
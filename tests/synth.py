@@ -0,0 +1,27 @@
+"""Synthetic 16 kHz recordings for the tests."""
+import wave
+
+import numpy as np
+
+SR = 16000
+
+def syllables(seconds: float, seed: int = 0):
+    """0.3 s harmonic bursts at random pitches with 0.15 s pauses, over faint noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(0.3 * SR)) / SR
+    period = int(0.45 * SR)
+    x = rng.normal(0, 30, int(seconds * SR))
+    for start in range(0, len(x) - len(t), period):
+        f0 = rng.uniform(100, 250)
+        burst = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+        x[start:start + len(t)] += 6000 * burst * np.hanning(len(t))
+    return x
+
+def write_wav(path, x):
+    """Write `x` as a 16-bit mono WAV; returns `path`."""
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SR)
+        w.writeframes(np.clip(x, -32768, 32767).astype("<i2").tobytes())
+    return path
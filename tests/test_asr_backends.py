@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+import whisper_transcribe
+from asr_backends import BACKENDS, StubBackend, build_backend
+from synth import SR, syllables, write_wav
+from transcript_cache import TranscriptCache
+
+def test_backends_take_the_hf_pipeline_call():
+    pipe = build_backend("stub")
+    chunk = np.linspace(-0.5, 0.5, 3 * SR, dtype=np.float32)
+    [out] = pipe([{"raw": chunk, "sampling_rate": SR}], batch_size=4)
+    assert out == pipe({"raw": chunk.copy(), "sampling_rate": SR})  # same audio, same text
+    assert len(out["text"].split()) == 6  # 2 words per second
+    assert pipe([]) == []
+    with pytest.raises(ValueError, match="Unknown ASR backend"):
+        build_backend("nope")
+    assert {"transformers", "whisperx", "ctranslate2", "stub"} <= set(BACKENDS)
+
+def test_engines_never_share_cached_transcripts(tmp_path):
+    wav = write_wav(tmp_path / "a.wav", syllables(4))
+    with TranscriptCache(tmp_path / "cache.sqlite") as cache:
+        first = StubBackend(words_per_second=2)
+        [(_, a)] = whisper_transcribe.transcribe_files(first, [wav], cache=cache)
+        [(_, again)] = whisper_transcribe.transcribe_files(first, [wav], cache=cache)
+        other = StubBackend(words_per_second=1)
+        [(_, b)] = whisper_transcribe.transcribe_files(other, [wav], cache=cache)
+    assert again == a and first.calls == 1
+    assert other.calls == 1 and len(b["transcript"].split()) < len(a["transcript"].split())
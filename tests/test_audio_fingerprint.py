@@ -0,0 +1,57 @@
+import shutil
+from functools import partial
+
+import numpy as np
+
+import audio_fingerprint
+import whisper_transcribe
+from asr_backends import StubBackend
+from audio_fingerprint import FingerprintDB
+from synth import SR, syllables, write_wav
+
+def stub_transcribe(pipe):
+    return partial(whisper_transcribe.transcribe_files, pipe)
+
+def test_match_survives_trim_and_level():
+    x = syllables(8, seed=1)
+    other = syllables(8, seed=2)
+    # a later trim by an odd number of samples and 6 dB quieter
+    same = 0.5 * x[int(0.3 * SR) + 37:]
+    with FingerprintDB(":memory:") as db:
+        for path, samples in (("/x.wav", x), ("/other.wav", other)):
+            pcm = np.clip(samples, -32768, 32767).astype(np.int16)
+            db.add(path, *audio_fingerprint.fingerprint(pcm, SR), len(pcm) / SR)
+        pcm = np.clip(same, -32768, 32767).astype(np.int16)
+        match = db.match("/same.wav", *audio_fingerprint.fingerprint(pcm, SR), len(pcm) / SR)
+        assert match is not None and match[1] == "/x.wav"
+        pcm = np.clip(syllables(8, seed=3), -32768, 32767).astype(np.int16)
+        assert db.match("/new.wav", *audio_fingerprint.fingerprint(pcm, SR), 8.0) is None
+        silent = np.zeros(8 * SR, dtype=np.int16)
+        assert db.match("/silent.wav", *audio_fingerprint.fingerprint(silent, SR), 8.0) is None
+
+def test_duplicates_are_transcribed_once(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    a = write_wav(first / "a.wav", syllables(6, seed=1))
+    b = write_wav(first / "b.wav", syllables(6, seed=2))
+    c = shutil.copy(a, first / "c.wav")
+    pipe = StubBackend()
+    config = {"backend": "stub"}
+    with FingerprintDB(":memory:") as db:
+        out = dict(whisper_transcribe.transcribe_deduplicated(
+            stub_transcribe(pipe), [a, b, c], db, config
+        ))
+        assert pipe.calls == 2
+        assert out[c]["duplicate_of"] == str(a.resolve())
+        assert out[c]["transcript"] == out[a]["transcript"]
+        assert "duplicate_of" not in out[a] and "duplicate_of" not in out[b]
+
+        # a later folder reuses the stored transcripts without the model
+        again = write_wav(second / "b.wav", syllables(6, seed=2))
+        stats = {}
+        out = dict(whisper_transcribe.transcribe_deduplicated(
+            stub_transcribe(pipe), [again], db, config, stats=stats
+        ))
+        assert pipe.calls == 2 and stats["duplicates"] == 1
+        assert out[again]["duplicate_of"] == str(b.resolve())
@@ -0,0 +1,70 @@
+import json
+
+import build_transcript
+
+def write_records(path, records, tail=""):
+    path.write_text("".join(json.dumps(r) + "\n\n" for r in records) + tail, encoding="utf-8")
+    return path
+
+def test_iter_whisper_jsonl_chunks_and_skips_bad_lines(tmp_path):
+    records = [{"audio_filepath": f"/{i}.wav", "transcript": f"t{i}", "duration": "0:01"}
+               for i in range(5)]
+    path = write_records(tmp_path / "w.jsonl", records, tail='{"audio_filepath": "/torn')
+    blocks = list(build_transcript.iter_whisper_jsonl(path, chunk_rows=2))
+    assert [len(block) for block in blocks] == [2, 2, 1]
+    assert all("duplicate_of" not in block for block in blocks)
+    assert list(blocks[-1]["transcript_whisper"]) == ["t4"]
+
+def test_iter_whisper_jsonl_empty_file(tmp_path):
+    path = tmp_path / "w.jsonl"
+    path.write_text("", encoding="utf-8")
+    (block,) = build_transcript.iter_whisper_jsonl(path)
+    assert block.empty and block["audio_filepath"].dtype == object
+    assert build_transcript.parse_filenames(block["audio_filepath"]).empty
+
+def test_read_whisper_jsonl_duplicates(tmp_path):
+    path = write_records(tmp_path / "w.jsonl", [
+        {"audio_filepath": "/a.wav", "transcript": "old"},
+        {"audio_filepath": "/b.wav", "transcript": "uno", "duplicate_of": "/x.wav"},
+        {"audio_filepath": "/a.wav", "transcript": "new"},
+    ])
+    df = build_transcript.read_whisper_jsonl(path).set_index("audio_filepath")
+    assert df.loc["/a.wav", "transcript_whisper"] == "new"
+    assert df.loc["/b.wav", "duplicate_of"] == "/x.wav"
+
+def test_dataset_rows_are_replaced_per_folder(tmp_path):
+    import pandas as pd
+
+    def build(folder, names):
+        folder.mkdir(exist_ok=True)
+        path = write_records(folder / "whisper_output.jsonl", [
+            {"audio_filepath": str(folder / f"{name}.wav"), "transcript": name, "duration": "0:01"}
+            for name in names
+        ])
+        build_transcript.build_transcript(path, folder / "t.csv", dataset_dir=tmp_path / "ds")
+
+    def rows():
+        df = pd.read_parquet(tmp_path / "ds")
+        return sorted(df["transcript_whisper"])
+
+    # both folders hold answers of the same user and questionnaire, so
+    # their files share a partition
+    build(tmp_path / "f1", ["u1_GR_Survey_q1", "u1_GR_Survey_q2"])
+    build(tmp_path / "f2", ["u1_GR_Survey_q3", "u1_GR_Survey_q4"])
+    assert rows() == ["u1_GR_Survey_q1", "u1_GR_Survey_q2", "u1_GR_Survey_q3", "u1_GR_Survey_q4"]
+    build(tmp_path / "f1", ["u1_GR_Survey_q1"])
+    assert rows() == ["u1_GR_Survey_q1", "u1_GR_Survey_q3", "u1_GR_Survey_q4"]
+
+def test_excel_skipped_without_xlsxwriter_is_not_reported(tmp_path, monkeypatch, capsys):
+    import sys
+    monkeypatch.setitem(sys.modules, "xlsxwriter", None)  # import fails
+    monkeypatch.setattr(build_transcript, "EXCEL_MAX_ROWS", 2)
+    path = write_records(tmp_path / "w.jsonl", [
+        {"audio_filepath": f"/u1_GR_Survey_q{i}.wav", "transcript": "uno"} for i in range(3)
+    ])
+    xlsx = tmp_path / "t.xlsx"
+    xlsx.write_bytes(b"from an earlier run")
+    build_transcript.build_transcript(path, tmp_path / "t.csv", xlsx)
+    assert not xlsx.exists()
+    out = capsys.readouterr().out
+    assert "Wrote 3 rows to" in out and "t.xlsx" not in out
@@ -0,0 +1,46 @@
+import convert_and_trim
+
+def fake_convert(calls):
+    """Stand-in for `convert_file` that writes a dummy WAV instead of running ffmpeg."""
+    def convert(webm_file, out_dir, trim_map, log=None, two_pass=False):
+        calls.append(webm_file.name)
+        (out_dir / f"{webm_file.stem}.wav").write_bytes(b"RIFF")
+        return True
+    return convert
+
+def statuses(folder, trim_map):
+    return {webm.name: status for webm, _, status in convert_and_trim.iter_convert_folder(folder, trim_map)}
+
+def test_only_new_or_changed_inputs_are_converted(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(convert_and_trim, "convert_file", fake_convert(calls))
+    folder = tmp_path / "021KK"
+    folder.mkdir()
+    for name in ("u1_q1.webm", "u1_q2.webm", "u1_q3.webm"):
+        (folder / name).write_bytes(name.encode())
+    trim_map = {"q1": 0.5, "q2": 1.0}
+
+    assert set(statuses(folder, trim_map).values()) == {"converted"}
+    assert set(statuses(folder, trim_map).values()) == {"up-to-date"}
+    assert len(calls) == 3
+
+    (folder / "u1_q1.webm").write_bytes(b"a new take, longer")  # changed input
+    assert statuses(folder, {"q1": 0.5, "q2": 2.0}) == {  # q2 trimmed differently
+        "u1_q1.webm": "converted", "u1_q2.webm": "converted", "u1_q3.webm": "up-to-date",
+    }
+    assert calls[3:] == ["u1_q1.webm", "u1_q2.webm"]
+
+def test_outputs_of_removed_inputs_are_deleted(tmp_path, monkeypatch):
+    monkeypatch.setattr(convert_and_trim, "convert_file", fake_convert([]))
+    folder = tmp_path / "021KK"
+    folder.mkdir()
+    for name in ("u1_q1.webm", "u1_q2.webm"):
+        (folder / name).write_bytes(name.encode())
+    wav_dir = convert_and_trim.wav_dir_for(folder)
+    convert_and_trim.convert_folder(folder, {})
+    assert (wav_dir / "u1_q2.wav").is_file()
+
+    (folder / "u1_q2.webm").unlink()
+    assert statuses(folder, {}) == {"u1_q1.webm": "up-to-date"}
+    assert not (wav_dir / "u1_q2.wav").exists()
+    assert list(convert_and_trim.load_manifest(wav_dir)) == ["u1_q1.webm"]
@@ -0,0 +1,61 @@
+from functools import partial
+
+import numpy as np
+
+import whisper_transcribe
+from asr_backends import StubBackend
+from audio_fingerprint import FingerprintDB
+from synth import SR, syllables, write_wav
+
+def stub_transcribe(pipe):
+    return partial(whisper_transcribe.transcribe_files, pipe)
+
+def test_prescreen_routes_by_speech(tmp_path):
+    rng = np.random.default_rng(0)
+    silent = write_wav(tmp_path / "silent.wav", rng.normal(0, 300, 8 * SR))
+    short = write_wav(tmp_path / "short.wav", syllables(2, seed=3) + rng.normal(0, 300, 2 * SR))
+    long = write_wav(tmp_path / "long.wav", syllables(10, seed=4) + rng.normal(0, 300, 10 * SR))
+    full, fast = StubBackend(), StubBackend()
+    stats = {}
+    out = dict(whisper_transcribe.transcribe_prescreened(
+        stub_transcribe(full), stub_transcribe(fast), [silent, short, long], stats=stats
+    ))
+    assert {wav.name: r["route"] for wav, r in out.items()} == {
+        "silent.wav": "empty", "short.wav": "fast", "long.wav": "full",
+    }
+    assert out[silent]["transcript"] == ""
+    assert full.calls == 1 and fast.calls == 1
+    assert (stats["routed_empty"], stats["routed_fast"], stats["escalated"]) == (1, 1, 0)
+
+def test_prescreen_escalates_wordy_short_takes(tmp_path):
+    short = write_wav(tmp_path / "short.wav", syllables(2.5, seed=5))
+    full, fast = StubBackend(), StubBackend(words_per_second=8)
+    stats = {}
+    out = dict(whisper_transcribe.transcribe_prescreened(
+        stub_transcribe(full), stub_transcribe(fast), [short], stats=stats
+    ))
+    assert out[short]["route"] == "full" and out[short]["escalated"]
+    assert full.calls == 1 and fast.calls == 1 and stats["escalated"] == 1
+
+def test_duplicates_get_their_own_route(tmp_path):
+    a = write_wav(tmp_path / "a.wav", syllables(10, seed=6))
+    b = write_wav(tmp_path / "b.wav", syllables(10, seed=6))
+    full, fast = StubBackend(), StubBackend()
+    stats = {}
+
+    def stages(wavs, **kwargs):
+        # stand in for the large model taking half real time
+        for wav, result in stub_transcribe(full)(wavs, **kwargs):
+            kwargs["stats"]["model_seconds"] += 5.0
+            yield wav, result
+
+    with FingerprintDB(":memory:") as db:
+        out = dict(whisper_transcribe.transcribe_stages(
+            stages, [a, b], stats=stats, transcribe_fast=stub_transcribe(fast),
+            fingerprints=db, fingerprint_config={"backend": "stub"},
+        ))
+    assert out[a]["route"] == "full" and full.calls == 1
+    assert out[b]["route"] == "duplicate" and out[b]["duplicate_of"] == str(a.resolve())
+    assert out[b]["speech_seconds"] == out[a]["speech_seconds"]
+    assert out[b]["saved_seconds"] == 5.0
+    assert "escalated" not in out[b]
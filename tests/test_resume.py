@@ -0,0 +1,35 @@
+import os
+
+import whisper_transcribe
+
+def test_load_done_drops_torn_last_record(tmp_path):
+    path = tmp_path / "whisper_output.jsonl"
+    path.write_bytes(b'{"audio_filepath": "/a.wav", "wav_stamp": [4, 1]}\nnot json\n\n'
+                     b'{"audio_filepath": "/b.wav"}\n{"audio_filepath": "/c.w')
+    assert whisper_transcribe.load_done(path) == {"/a.wav": [4, 1], "/b.wav": None}
+    assert path.read_bytes().endswith(b'"/b.wav"}\n')
+
+def test_load_done_ends_last_line(tmp_path):
+    path = tmp_path / "whisper_output.jsonl"
+    path.write_bytes(b'{"audio_filepath": "/a.wav"}')
+    assert list(whisper_transcribe.load_done(path)) == ["/a.wav"]
+    assert path.read_bytes() == b'{"audio_filepath": "/a.wav"}\n'
+    assert whisper_transcribe.load_done(tmp_path / "missing.jsonl") == {}
+
+def test_resume_redoes_reconverted_and_forgets_removed_wavs(tmp_path):
+    wavs = []
+    for name in ("a", "b", "c"):
+        wav = tmp_path / f"{name}.wav"
+        wav.write_bytes(b"RIFF" + name.encode() * 100)
+        wavs.append(wav)
+    jsonl = tmp_path / "whisper_output.jsonl"
+    whisper_transcribe.write_jsonl(((wav, {"transcript": wav.stem}) for wav in wavs), jsonl)
+    assert whisper_transcribe.skip_done(wavs, jsonl) == []
+
+    a, b, c = wavs
+    a.write_bytes(b"RIFF" + b"a" * 60)  # re-converted with another trim
+    st = a.stat()
+    os.utime(a, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    c.unlink()  # removed as a stale output
+    assert whisper_transcribe.skip_done([a, b], jsonl) == [a]
+    assert list(whisper_transcribe.load_done(jsonl)) == [str(b.resolve())]
@@ -0,0 +1,19 @@
+import convert_and_trim
+import run_pipeline
+
+def test_stream_counts_failed_conversions(tmp_path, monkeypatch):
+    def convert(webm_file, out_dir, trim_map, log=None, two_pass=False):
+        if b"junk" in webm_file.read_bytes():
+            return False
+        (out_dir / f"{webm_file.stem}.wav").write_bytes(b"RIFF")
+        return True
+
+    monkeypatch.setattr(convert_and_trim, "convert_file", convert)
+    folder = tmp_path / "021KK"
+    folder.mkdir()
+    for name, data in (("u1_q1.webm", b"ok"), ("u1_q2.webm", b"junk"), ("u1_q3.webm", b"ok")):
+        (folder / name).write_bytes(data)
+    counts, failed = {}, []
+    wavs = list(run_pipeline.stream_converted(folder, {}, queue_size=1, counts=counts, failed=failed))
+    assert [wav.name for wav in wavs] == ["u1_q1.wav", "u1_q3.wav"]
+    assert counts == {"converted": 2, "failed": 1} and failed == ["u1_q2.webm"]
@@ -0,0 +1,45 @@
+import sqlite3
+
+import numpy as np
+
+from transcript_cache import TranscriptCache, audio_key
+
+def record(n: int) -> dict:
+    """A record stored as `n` bytes of JSON."""
+    return {"transcript": "x" * (n - len('{"transcript": "", "duration": 1}')), "duration": 1}
+
+def test_least_recently_used_records_are_evicted(tmp_path):
+    with TranscriptCache(tmp_path / "cache.sqlite", max_bytes=300) as cache:
+        for key in "abc":
+            cache.put(key, record(100))
+        assert cache.size_bytes() == 300
+        assert cache.get("a") is not None  # now the most recently used
+        cache.put("d", record(100))
+        assert cache.get("b") is None
+        assert all(cache.get(key) is not None for key in "acd")
+
+        cache.put("a", record(150))  # replacing a record updates the total
+        assert cache.size_bytes() == 250
+        assert cache.get("c") is None and cache.get("d") is not None
+
+def test_running_total_matches_the_table(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    with TranscriptCache(path, max_bytes=10_000) as cache:
+        for i in range(30):
+            cache.put(str(i % 20), record(50 + i))
+        cache.max_bytes = 1_000
+        cache.evict()
+        total = cache.size_bytes()
+    with sqlite3.connect(path) as db:
+        assert total == db.execute("SELECT SUM(size) FROM transcripts").fetchone()[0] <= 1_000
+        # a cache from before the running total gets it computed once on open
+        db.execute("DROP TABLE cache_size")
+    with TranscriptCache(path) as cache:
+        assert cache.size_bytes() == total
+
+def test_key_depends_on_audio_and_config():
+    samples = np.arange(1600, dtype=np.int16)
+    key = audio_key(samples, 16000, {"model": "large-v3"})
+    assert key == audio_key(samples.copy(), 16000, {"model": "large-v3"})
+    assert key != audio_key(samples, 16000, {"model": "small"})
+    assert key != audio_key(samples[1:], 16000, {"model": "large-v3"})
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from transcript_index import TranscriptIndex
+
+def table(*rows):
+    return pd.DataFrame(rows, columns=["audio_filepath", "username", "questionnaire", "question",
+                                       "duration", "transcript_whisper"])
+
+def test_upsert_replaces_a_folders_rows(tmp_path):
+    with TranscriptIndex(tmp_path / "index.sqlite") as index:
+        index.upsert(table(
+            ("/a/u1_PE_q7_1.wav", "u1", "PE", "q7", 3.0, "uno"),
+            ("/a/u1_PE_q7_2.wav", "u1", "PE", "q7", 4.0, "dos"),
+            ("/a/u2_PE_q7.wav", "u2", "PE", "q7", 5.0, "tres"),
+        ), folder="/a")
+        index.upsert(table(("/b/u3_PE_q7.wav", "u3", "PE", "q7", "", "cuatro")), folder="/b")
+        assert len(index.duplicates()) == 2
+
+        # /a is rebuilt after u1's second take was deleted and u2's re-transcribed
+        index.upsert(table(
+            ("/a/u1_PE_q7_1.wav", "u1", "PE", "q7", 3.0, "uno"),
+            ("/a/u2_PE_q7.wav", "u2", "PE", "q7", 5.0, "tres otra vez"),
+        ), folder="/a")
+        rows = index.answers("PE", "q7")
+        assert [(r["username"], r["transcript"]) for r in rows] == [
+            ("u1", "uno"), ("u2", "tres otra vez"), ("u3", "cuatro"),
+        ]
+        assert rows[2]["duration"] is None and rows[2]["folder"] == "/b"
+        assert index.duplicates() == []
+        assert index.counts() == {"rows": 3, "participants": 3, "folders": 2}
@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import transcription_service
+from asr_backends import StubBackend
+from synth import syllables, write_wav
+
+@pytest.fixture
+def serve():
+    """Start a service on StubBackend behind an HTTP server on a free loopback port."""
+    running = []
+
+    def start(**kwargs):
+        service = transcription_service.TranscriptionService(StubBackend(), **kwargs).start()
+        server = transcription_service.make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        running.append((service, server))
+        return service, f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for service, server in running:
+        server.shutdown()
+        server.server_close()
+        service.stop()
+
+def call(url, payload=None):
+    data = None if payload is None else json.dumps(payload).encode("utf-8")
+    with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=10) as resp:
+        return resp.status, json.loads(resp.read())
+
+def wait_for(url, job_id):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        _, info = call(f"{url}/jobs/{job_id}")
+        if info["status"] in ("done", "failed"):
+            return info
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def test_jobs_report_per_file_errors(serve, tmp_path):
+    folder = tmp_path / "021KK"
+    folder.mkdir()
+    write_wav(folder / "a.wav", syllables(3, seed=1))
+    write_wav(folder / "b.wav", syllables(5, seed=2))
+    bad = folder / "c.wav"
+    bad.write_bytes(b"not a wav at all")
+    _, url = serve(max_wait=0.01)
+
+    code, job = call(f"{url}/jobs", {"paths": [str(folder)]})
+    assert code == 202 and job["total"] == 3
+    info = wait_for(url, job["id"])
+    assert info["status"] == "done" and info["done"] == 3
+    records = {r["audio_filepath"].rsplit("/", 1)[-1]: r for r in info["results"]}
+    assert "error" in records["c.wav"] and "transcript" not in records["c.wav"]
+    assert records["a.wav"]["transcript"] and "error" not in records["b.wav"]
+
+    # a job whose every file fails is "failed"
+    _, job = call(f"{url}/jobs", {"paths": [str(bad)]})
+    assert wait_for(url, job["id"])["status"] == "failed"
+
+    with pytest.raises(urllib.error.HTTPError) as e:
+        call(f"{url}/jobs", {"paths": [str(tmp_path / "missing")]})
+    assert e.value.code == 400
+
+def test_finished_jobs_are_forgotten(serve, tmp_path):
+    wav = write_wav(tmp_path / "a.wav", syllables(2))
+    service, url = serve(max_wait=0.01, keep_jobs=1)
+    first = call(f"{url}/jobs", {"paths": [str(wav)]})[1]["id"]
+    wait_for(url, first)
+    second = call(f"{url}/jobs", {"paths": [str(wav)]})[1]["id"]
+    wait_for(url, second)
+    assert list(service.jobs) == [second]
+    with pytest.raises(urllib.error.HTTPError) as e:
+        call(f"{url}/jobs/{first}")
+    assert e.value.code == 404
+    assert [info["id"] for info in call(f"{url}/jobs")[1]] == [second]
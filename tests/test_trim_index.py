@@ -0,0 +1,21 @@
+from pathlib import Path
+
+from convert_and_trim import TrimIndex, find_trim, load_trim_map
+
+def test_trim_index_lookup():
+    index = TrimIndex({"q1": 0.5, "Survey_q1": 1.0, "vey": 2.0, "user7": 1.0, "x_": 3.0})
+    # keys inside the longest match never conflict; other keys do only
+    # when they ask for a different trim
+    assert index.lookup("GR_Survey_q1_user7") == ("Survey_q1", [])
+    assert index.lookup("GR_Survey_q1_x_") == ("Survey_q1", ["x_"])
+    assert index.lookup("nothing here") == (None, [])
+    assert index["vey"] == 2.0 and len(index) == 5
+
+def test_longest_key_wins_whatever_the_order(tmp_path):
+    map_file = tmp_path / "trim_map.txt"
+    map_file.write_text('# key seconds\n"GR_Survey_q1" 1.5\nGR_Survey_q11 3.0\nbad x\n', encoding="utf-8")
+    trim_map = load_trim_map(map_file)
+    assert dict(trim_map) == {"GR_Survey_q1": 1.5, "GR_Survey_q11": 3.0}
+    assert find_trim(Path("u1_GR_Survey_q11_take1.webm"), trim_map) == 3.0
+    assert find_trim(Path("u1_GR_Survey_q1_take1.webm"), trim_map) == 1.5
+    assert find_trim(Path("u1_PE_Inventory_q7.webm"), trim_map) == 0.0
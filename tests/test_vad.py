@@ -0,0 +1,47 @@
+import numpy as np
+
+import vad
+
+SR = 16000
+
+def tone(seconds: float, amplitude: float = 6000.0):
+    t = np.arange(int(seconds * SR)) / SR
+    return amplitude * sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 6))
+
+def pcm(x):
+    return np.clip(x, -32768, 32767).astype(np.int16)
+
+def noise(seconds: float, rms: float, seed: int = 0):
+    return np.random.default_rng(seed).normal(0, rms, int(seconds * SR))
+
+def test_steady_noise_is_not_speech():
+    # about -41 and -50 dBFS: ordinary laptop-microphone room noise
+    for rms in (300, 100):
+        assert vad.speech_segments(pcm(noise(10, rms)), SR) == []
+
+def test_speech_over_steady_noise():
+    x = noise(10, 300)
+    x[4 * SR:6 * SR] += tone(2)
+    segments = vad.speech_segments(pcm(x), SR)
+    assert len(segments) == 1
+    start, end = segments[0]
+    pad = int(vad.PAD_S * SR)
+    assert 4 * SR - pad - SR // 10 <= start <= 4 * SR
+    assert 6 * SR <= end <= 6 * SR + pad + SR // 10
+    assert vad.speech_seconds(segments, SR) < 3
+
+def test_digital_silence_and_empty_input():
+    assert vad.speech_segments(np.zeros(5 * SR, dtype=np.int16), SR) == []
+    assert vad.speech_segments(np.zeros(0, dtype=np.int16), SR) == []
+
+def syllables(seconds: float):
+    """0.3 s bursts separated by 0.15 s pauses: speech without a long break."""
+    period = np.zeros(int(0.45 * SR))
+    period[:int(0.3 * SR)] = tone(0.3) * np.hanning(int(0.3 * SR))
+    return np.resize(period, int(seconds * SR))
+
+def test_segments_respect_max_length():
+    x = pcm(syllables(70) + noise(70, 30))
+    segments = vad.speech_segments(x, SR, max_s=28)
+    assert all(end - start <= 28 * SR for start, end in segments)
+    assert segments[0][0] == 0 and segments[-1][1] == len(x)
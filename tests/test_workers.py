@@ -0,0 +1,15 @@
+import whisper_transcribe
+from asr_backends import StubBackend
+from instrumentation import RunReport
+from synth import syllables, write_wav
+
+def test_pooled_files_share_batches(tmp_path):
+    wavs = [write_wav(tmp_path / f"{i}.wav", syllables(2 + i, seed=i)) for i in range(6)]
+    report = RunReport()
+    pooled = list(whisper_transcribe.transcribe_parallel(
+        wavs, workers=2, backend="stub", batch_size=3, report=report
+    ))
+    serial = list(whisper_transcribe.transcribe_files(StubBackend(), wavs, batch_size=3))
+    assert pooled == serial
+    # two tasks of three one-chunk files, one model call each
+    assert [batch["chunks"] for batch in report.batches] == [3, 3]
@@ -0,0 +1,120 @@
+"""
+Content-addressed on-disk cache of Whisper transcripts.
+
+Records are keyed by a hash of the decoded PCM samples plus everything that
+can change the transcript (model id, dtype, language, chunking), so the same
+recording is only transcribed once, whichever folder or filename it has.
+The cache is a single SQLite file with a size cap and LRU eviction.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "portrait_transcriber" / "transcripts.sqlite"
+DEFAULT_MAX_MB = 1024
+
+def audio_key(samples, sample_rate: int, config: dict) -> str:
+    """Hex SHA-256 over the transcription config, sample rate and raw samples."""
+    h = hashlib.sha256()
+    h.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+    h.update(f"|{sample_rate}|{samples.dtype.str}|".encode("ascii"))
+    h.update(memoryview(samples).cast("B"))
+    return h.hexdigest()
+
+class TranscriptCache:
+    """SQLite-backed key → record store, evicting least recently used records past `max_bytes`."""
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_MB * 2**20):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # one thread at a time, but not necessarily the one that opened it
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # the total size lives in a one-row table kept current by triggers,
+        # so checking the cap doesn't sum the whole table on every insert,
+        # and every process sharing the file sees the same total
+        self._db.executescript(
+            "BEGIN IMMEDIATE;"
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            " key TEXT PRIMARY KEY,"
+            " record TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS transcripts_last_used ON transcripts(last_used);"
+            "CREATE TABLE IF NOT EXISTS cache_size (total INTEGER NOT NULL);"
+            "INSERT INTO cache_size SELECT COALESCE(SUM(size), 0) FROM transcripts"
+            " WHERE NOT EXISTS (SELECT 1 FROM cache_size);"
+            "CREATE TRIGGER IF NOT EXISTS transcripts_added AFTER INSERT ON transcripts"
+            " BEGIN UPDATE cache_size SET total = total + new.size; END;"
+            "CREATE TRIGGER IF NOT EXISTS transcripts_removed AFTER DELETE ON transcripts"
+            " BEGIN UPDATE cache_size SET total = total - old.size; END;"
+            "CREATE TRIGGER IF NOT EXISTS transcripts_resized AFTER UPDATE OF size ON transcripts"
+            " BEGIN UPDATE cache_size SET total = total + new.size - old.size; END;"
+            "COMMIT;"
+        )
+
+    def get(self, key: str):
+        """Return the cached record for `key` (and mark it as recently used), or None."""
+        row = self._db.execute(
+            "SELECT record FROM transcripts WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self._db:
+            self._db.execute(
+                "UPDATE transcripts SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+        return json.loads(row[0])
+
+    def put(self, key: str, record: dict):
+        """Store `record` under `key`, then evict old records if over the size cap."""
+        data = json.dumps(record, ensure_ascii=False)
+        with self._db:
+            # an upsert, not INSERT OR REPLACE: the replaced row's delete
+            # wouldn't fire the size trigger
+            self._db.execute(
+                "INSERT INTO transcripts (key, record, size, last_used) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET record = excluded.record,"
+                " size = excluded.size, last_used = excluded.last_used",
+                (key, data, len(data.encode("utf-8")), time.time()),
+            )
+        self.evict()
+
+    def size_bytes(self) -> int:
+        return self._db.execute("SELECT total FROM cache_size").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop least recently used records until the cache fits `max_bytes`; returns how many."""
+        excess = self.size_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+        removed = 0
+        with self._db:
+            rows = self._db.execute(
+                "SELECT key, size FROM transcripts ORDER BY last_used"
+            )
+            doomed = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+            self._db.executemany("DELETE FROM transcripts WHERE key = ?", doomed)
+            removed = len(doomed)
+        return removed
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Persistent index of transcript rows across all processed folders.
+
+`build_transcript` upserts each folder's table into one SQLite file,
+indexed by questionnaire/question and username, so questions like "every
+answer to PE_Inventory q7" or "which participants recorded a question
+twice" are indexed lookups instead of globbing and re-reading every CSV:
+
+    python transcript_index.py index.sqlite answers PE_Inventory q7
+    python transcript_index.py index.sqlite duplicates --csv dups.csv
+"""
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+COLUMNS = ("audio_filepath", "folder", "username", "questionnaire", "question", "qnum",
+           "duration", "transcript")
+
+def _qnum(question):
+    """16 for 'q16'; None for anything else."""
+    if isinstance(question, str) and question[1:].isdigit():
+        return int(question[1:])
+    return None
+
+class TranscriptIndex:
+    """SQLite table of transcript rows keyed by audio_filepath."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " audio_filepath TEXT PRIMARY KEY,"
+            " folder TEXT,"
+            " username TEXT,"
+            " questionnaire TEXT,"
+            " question TEXT,"
+            " qnum INTEGER,"
+            " duration REAL,"
+            " transcript TEXT,"
+            " updated REAL NOT NULL)"
+        )
+        for name, cols in (
+            ("answers_question", "questionnaire, qnum, username"),
+            ("answers_user", "username, questionnaire, qnum"),
+            ("answers_folder", "folder"),
+        ):
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS {name} ON answers({cols})")
+        self._db.commit()
+
+    def upsert(self, df, folder: str = None) -> int:
+        """
+        Insert or update the rows of a `build_transcript` table, all from
+        `folder`. Rows of `folder` that are no longer in `df` (e.g. deleted
+        recordings) are removed. Returns the number of rows written.
+        """
+        now = time.time()
+        cols = df[["audio_filepath", "username", "questionnaire", "question", "duration",
+                   "transcript_whisper"]].astype(object)
+        cols = cols.where(cols.notna(), None)  # NaN/NA → NULL
+        rows = [
+            (fp, folder, user or None, qn or None, q or None, _qnum(q),
+             None if dur == "" else dur, text, now)
+            for fp, user, qn, q, dur, text in cols.itertuples(index=False, name=None)
+        ]
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO answers (audio_filepath, folder, username, questionnaire, question,"
+                " qnum, duration, transcript, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(audio_filepath) DO UPDATE SET"
+                " folder = excluded.folder, username = excluded.username,"
+                " questionnaire = excluded.questionnaire, question = excluded.question,"
+                " qnum = excluded.qnum, duration = excluded.duration,"
+                " transcript = excluded.transcript, updated = excluded.updated",
+                rows,
+            )
+            if folder is not None:
+                # anything from this folder not touched just now is gone from it
+                self._db.execute(
+                    "DELETE FROM answers WHERE folder = ? AND updated < ?", (folder, now)
+                )
+        return len(rows)
+
+    def _select(self, where: str = "", params=()) -> list:
+        sql = f"SELECT {', '.join(COLUMNS)} FROM answers {where}"
+        return [dict(row) for row in self._db.execute(sql, params)]
+
+    def answers(self, questionnaire: str, question: str = None, username: str = None) -> list:
+        """Rows for `questionnaire` (optionally one `question` and/or `username`), in order."""
+        where, params = ["questionnaire = ?"], [questionnaire]
+        if question is not None:
+            where.append("qnum = ?")
+            params.append(_qnum(question) if isinstance(question, str) else question)
+        if username is not None:
+            where.append("username = ?")
+            params.append(username)
+        return self._select(
+            f"WHERE {' AND '.join(where)} ORDER BY qnum, username, audio_filepath", params
+        )
+
+    def participant(self, username: str) -> list:
+        """All rows of `username`, by questionnaire and question."""
+        return self._select(
+            "WHERE username = ? ORDER BY questionnaire, qnum, audio_filepath", (username,)
+        )
+
+    def duplicates(self, username: str = None) -> list:
+        """
+        Rows where a participant has more than one recording of the same
+        questionnaire question (what `duplicate_questions.csv` lists per
+        folder), across every indexed folder or just for `username`.
+        """
+        where, params = "WHERE username IS NOT NULL", ()
+        if username is not None:
+            where, params = "WHERE username = ?", (username,)
+        return self._select(
+            "JOIN (SELECT username AS u, questionnaire AS qn, qnum AS n FROM answers"
+            f" {where} GROUP BY username, questionnaire, qnum HAVING COUNT(*) > 1) AS d"
+            " ON username = d.u AND questionnaire = d.qn AND qnum = d.n"
+            " ORDER BY username, questionnaire, qnum, audio_filepath",
+            params,
+        )
+
+    def counts(self) -> dict:
+        rows, users, folders = self._db.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT username), COUNT(DISTINCT folder) FROM answers"
+        ).fetchone()
+        return {"rows": rows, "participants": users, "folders": folders}
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_rows(rows, out):
+    writer = csv.DictWriter(out, fieldnames=COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+def main():
+    p = argparse.ArgumentParser(description="Query the cross-folder transcript index.")
+    p.add_argument("index_db", type=Path, help="Index file written by build_transcript --index_db")
+    p.add_argument("--csv", type=Path, default=None, help="Write the rows here instead of stdout")
+    sub = p.add_subparsers(dest="command", required=True)
+    q = sub.add_parser("answers", help="All answers to a questionnaire (or one question)")
+    q.add_argument("questionnaire", help="e.g. PE_Inventory")
+    q.add_argument("question", nargs="?", default=None, help="e.g. q7")
+    q.add_argument("--username", default=None)
+    u = sub.add_parser("participant", help="Every answer of one participant")
+    u.add_argument("username")
+    d = sub.add_parser("duplicates", help="Questions a participant recorded more than once")
+    d.add_argument("--username", default=None)
+    sub.add_parser("stats", help="Row, participant and folder counts")
+    args = p.parse_args()
+
+    if not args.index_db.is_file():
+        print(f"❌ Index not found: {args.index_db}", file=sys.stderr)
+        sys.exit(1)
+    with TranscriptIndex(args.index_db) as index:
+        if args.command == "stats":
+            print(index.counts())
+            return
+        if args.command == "answers":
+            rows = index.answers(args.questionnaire, args.question, args.username)
+        elif args.command == "participant":
+            rows = index.participant(args.username)
+        else:
+            rows = index.duplicates(args.username)
+
+    if args.csv is not None:
+        with args.csv.open("w", newline="", encoding="utf-8-sig") as f:
+            write_rows(rows, f)
+        print(f"✅ Wrote {len(rows)} rows to {args.csv}")
+    else:
+        write_rows(rows, sys.stdout)
+
+if __name__ == "__main__":
+    main()
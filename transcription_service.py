@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Long-running local transcription service.
+
+Keeps one Whisper pipeline warm and accepts jobs (WAV/WebM files or whole
+folders) over HTTP on a loopback port or a Unix socket:
+
+    POST /jobs        {"paths": ["/data/021KK", "/data/x.wav"]} → {"id": ...}
+    GET  /jobs        summary of every job
+    GET  /jobs/<id>   status, progress and the records finished so far
+    GET  /health      queue depth and counters
+
+Finished jobs and their records are kept for --job-ttl seconds (at most
+--keep-jobs of them), then forgotten.
+
+Files from all queued jobs are gathered into one stream, so chunks from
+different jobs share model batches. `TranscriptionService` only needs a
+callable with the HF pipeline signature, so it runs with any engine from
+`asr_backends` (including the `stub` one) and no network access.
+"""
+import argparse
+import json
+import queue
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+import convert_and_trim
+import whisper_transcribe
+from asr_backends import BACKENDS, build_backend
+from transcript_cache import DEFAULT_CACHE_PATH, TranscriptCache
+
+AUDIO_SUFFIXES = (".wav", ".webm")
+
+def expand_paths(paths) -> list:
+    """Files to transcribe for a job: audio files as given, folders expanded in name order."""
+    files = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            files += sorted(
+                (p for p in path.iterdir()
+                 if p.suffix.lower() in AUDIO_SUFFIXES and not p.name.startswith(".")),
+                key=lambda p: p.name,
+            )
+        elif path.is_file() and path.suffix.lower() in AUDIO_SUFFIXES:
+            files.append(path)
+        else:
+            raise ValueError(f"Not an audio file or folder: {raw}")
+    return files
+
+class Job:
+    """One submitted request: its files and, as they finish, their records."""
+
+    def __init__(self, files):
+        self.id = uuid.uuid4().hex[:12]
+        self.files = files
+        self.results = [None] * len(files)
+        self.left = len(files)
+        self.status = "queued" if files else "done"
+        self.submitted = time.time()
+        self.finished = None if files else self.submitted
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": len(self.files),
+            "done": len(self.files) - self.left,
+            "submitted": self.submitted,
+            "finished": self.finished,
+        }
+
+class TranscriptionService:
+    """
+    Job queue plus a worker thread that batches queued files dynamically:
+    it takes whatever arrived within `max_wait` seconds of the first file
+    (up to `max_files`) and transcribes them together. Finished jobs are
+    forgotten after `job_ttl` seconds, and beyond the newest `keep_jobs`.
+    """
+
+    def __init__(self, pipe, batch_size: int = 8, max_wait: float = 0.05, max_files: int = 64,
+                 cache: TranscriptCache = None, trim_map=None, vad: bool = False,
+                 keep_jobs: int = 1000, job_ttl: float = 3600.0):
+        self.pipe = pipe
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_files = max_files
+        self.cache = cache
+        self.trim_map = trim_map
+        self.vad = vad
+        self.keep_jobs = keep_jobs
+        self.job_ttl = job_ttl
+        self.stats = {}
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()  # (job, index)
+        self._load_errors = {}
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="transcribe", daemon=True)
+
+    def start(self):
+        self._worker.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._worker.join()
+
+    # ─── Public API
+    def submit(self, paths) -> Job:
+        """Queue the audio files and folders in `paths` as one job."""
+        job = Job(expand_paths(paths))
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        for index in range(len(job.files)):
+            self._queue.put((job, index))
+        return job
+
+    def status(self, job_id: str, with_results: bool = True):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            info = job.summary()
+            if with_results:
+                info["results"] = list(job.results)
+            return info
+
+    def health(self) -> dict:
+        with self._lock:
+            running = sum(job.status in ("queued", "running") for job in self.jobs.values())
+            return {
+                "status": "ok",
+                "queued_files": self._queue.qsize(),
+                "active_jobs": running,
+                "jobs": len(self.jobs),
+                "stats": dict(self.stats),
+            }
+
+    def _prune(self):
+        """Forget expired finished jobs and all but the newest `keep_jobs`; call with the lock held."""
+        finished = sorted((job for job in self.jobs.values() if job.finished is not None),
+                          key=lambda job: job.finished)
+        excess = len(finished) - self.keep_jobs
+        now = time.time()
+        for i, job in enumerate(finished):
+            if i < excess or now - job.finished > self.job_ttl:
+                del self.jobs[job.id]
+
+    # ─── Worker
+    def _load(self, path: Path):
+        """Loader for `transcribe_files`: WAVs as usual, WebMs decoded in memory."""
+        try:
+            if path.suffix.lower() == ".webm":
+                trim = convert_and_trim.find_trim(path, self.trim_map) if self.trim_map else 0.0
+                return convert_and_trim.decode_to_array(path, trim, dtype="int16"), convert_and_trim.SAMPLE_RATE
+            return whisper_transcribe.load_audio(path)
+        except Exception as e:
+            # an unreadable file must not sink the rest of the batch
+            self._load_errors[path] = f"{type(e).__name__}: {e}"
+            return np.zeros(0, dtype=np.int16), convert_and_trim.SAMPLE_RATE
+
+    def _finish(self, job: Job, index: int, record: dict):
+        with self._lock:
+            job.results[index] = record
+            job.left -= 1
+            if job.left == 0:
+                job.status = "failed" if all("error" in r for r in job.results) else "done"
+                job.finished = time.time()
+                self._prune()
+
+    def _next_group(self) -> list:
+        try:
+            group = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(group) < self.max_files:
+            try:
+                group.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                group.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        while not self._stop.is_set():
+            group = self._next_group()
+            if not group:
+                continue
+            with self._lock:
+                for job, _ in group:
+                    job.status = "running"
+            paths = [job.files[index] for job, index in group]
+            done = 0
+            try:
+                results = whisper_transcribe.transcribe_files(
+                    self.pipe, paths, batch_size=self.batch_size, stats=self.stats,
+                    cache=self.cache, vad=self.vad, loader=self._load,
+                )
+                for (job, index), (path, result) in zip(group, results):
+                    result["audio_filepath"] = str(path.resolve())
+                    error = self._load_errors.pop(path, None)
+                    if error:
+                        result = {"audio_filepath": result["audio_filepath"], "error": error}
+                    self._finish(job, index, result)
+                    done += 1
+            except Exception as e:
+                for path in paths:
+                    self._load_errors.pop(path, None)
+                for job, index in group[done:]:
+                    self._finish(job, index, {
+                        "audio_filepath": str(job.files[index]),
+                        "error": f"{type(e).__name__}: {e}",
+                    })
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None  # set on the server-specific subclass
+
+    def address_string(self):
+        # Unix-socket clients have no (host, port) address
+        return self.client_address[0] if self.client_address else "local"
+
+    def _send(self, code: int, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        if parts == ["health"]:
+            self._send(200, self.service.health())
+        elif parts == ["jobs"]:
+            jobs = (self.service.status(job_id, with_results=False)
+                    for job_id in list(self.service.jobs))
+            self._send(200, [info for info in jobs if info is not None])  # skip jobs pruned meanwhile
+        elif len(parts) == 2 and parts[0] == "jobs":
+            info = self.service.status(parts[1])
+            if info is None:
+                self._send(404, {"error": f"unknown job {parts[1]}"})
+            else:
+                self._send(200, info)
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            paths = request.get("paths") or ([request["path"]] if "path" in request else [])
+            if not paths:
+                raise ValueError("expected {\"paths\": [...]}")
+            job = self.service.submit(paths)
+        except (ValueError, KeyError, AttributeError) as e:
+            self._send(400, {"error": str(e)})
+            return
+        self._send(202, job.summary())
+
+    def log_message(self, fmt, *args):
+        pass  # keep the console for job progress
+
+# socketserver only defines UnixStreamServer where AF_UNIX exists (not on
+# every Windows build), so the class must not be created unconditionally
+HAS_UNIX_SOCKETS = hasattr(socket, "AF_UNIX")
+
+if HAS_UNIX_SOCKETS:
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+def make_server(service: TranscriptionService, host: str = "127.0.0.1", port: int = 8765,
+                unix_socket: Path = None):
+    """HTTP server bound to `unix_socket` if given, else to `host:port`."""
+    handler = type("Handler", (_Handler,), {"service": service})
+    if unix_socket is not None:
+        if not HAS_UNIX_SOCKETS:
+            raise OSError("Unix sockets are not available on this platform")
+        unix_socket = Path(unix_socket)
+        if unix_socket.exists():
+            unix_socket.unlink()
+        return _UnixHTTPServer(str(unix_socket), handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Serve Whisper transcription jobs from one warm model."
+    )
+    p.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    p.add_argument("--port", type=int, default=8765, help="Port to bind (default: 8765)")
+    p.add_argument("--unix-socket", type=Path, default=None,
+                   help="Listen on this Unix socket instead of TCP")
+    p.add_argument("--backend", choices=sorted(BACKENDS), default="transformers",
+                   help="ASR engine (default: transformers)")
+    p.add_argument("--model-id", default=None,
+                   help="Model id or local path (default: the backend's large-v3)")
+    p.add_argument("--batch-size", type=int, default=8,
+                   help="Chunks per model call (default: 8)")
+    p.add_argument("--max-wait", type=float, default=0.05,
+                   help="Seconds to wait for more files before starting a batch (default: 0.05)")
+    p.add_argument("--trim-map", type=Path, default=None,
+                   help="Trim-map applied to submitted .webm files")
+    p.add_argument("--vad", action="store_true", help="Chunk on detected speech and skip silence")
+    p.add_argument("--keep-jobs", type=int, default=1000,
+                   help="Finished jobs (with their transcripts) kept for GET /jobs (default: 1000)")
+    p.add_argument("--job-ttl", type=float, default=3600.0,
+                   help="Seconds a finished job is kept (default: 3600)")
+    p.add_argument("--no-cache", action="store_true", help="Do not use the transcript cache")
+    args = p.parse_args()
+    if args.unix_socket is not None and not HAS_UNIX_SOCKETS:
+        p.error("--unix-socket needs Unix domain sockets, which this platform lacks; use --host/--port")
+
+    trim_map = convert_and_trim.load_trim_map(args.trim_map) if args.trim_map else None
+    pipe = build_backend(args.backend, args.model_id)
+    cache = None if args.no_cache else TranscriptCache(DEFAULT_CACHE_PATH)
+    service = TranscriptionService(
+        pipe, batch_size=max(1, args.batch_size), max_wait=args.max_wait,
+        cache=cache, trim_map=trim_map, vad=args.vad,
+        keep_jobs=max(0, args.keep_jobs), job_ttl=args.job_ttl,
+    ).start()
+    server = make_server(service, args.host, args.port, args.unix_socket)
+    where = args.unix_socket or f"http://{args.host}:{args.port}"
+    print(f"✅ Serving {args.backend} {args.model_id or 'default model'} on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        if cache is not None:
+            cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Energy-based voice activity detection on 16 kHz PCM, vectorized with NumPy.
+
+Frames are scored by RMS energy against an adaptive threshold, short gaps
+are bridged, and the resulting speech segments are split on the quietest
+frame and packed into model-sized chunks, so silence never reaches Whisper
+and chunk boundaries fall in pauses rather than mid-word.
+"""
+import numpy as np
+
+FRAME_MS = 30           # analysis frame length
+MIN_SPEECH_DB = -50.0   # frames quieter than this (dBFS) are never speech
+NOISE_MARGIN_DB = 12.0  # speech must be this far above the noise floor...
+DYNAMIC_RANGE_DB = 30.0 # ...and within this range of the loud frames
+MIN_PAUSE_S = 0.3       # shorter gaps stay inside a segment
+MIN_SPEECH_S = 0.1      # shorter bursts (clicks, pops) are dropped
+PAD_S = 0.2             # context kept on both sides of a segment
+_BLOCK_FRAMES = 4096    # frames scored at once, to bound temporary memory
+
+def frame_energy_db(samples, sr: int, frame_ms: int = FRAME_MS):
+    """
+    Return (energy, frame_len): the RMS energy of each full frame in dBFS
+    and the frame length in samples. int16 and float input are both
+    accepted; a trailing partial frame is ignored.
+    """
+    frame_len = max(1, sr * frame_ms // 1000)
+    n_frames = len(samples) // frame_len
+    scale = 32768.0 if samples.dtype == np.int16 else 1.0
+    power = np.empty(n_frames, dtype=np.float32)
+    for i in range(0, n_frames, _BLOCK_FRAMES):
+        j = min(i + _BLOCK_FRAMES, n_frames)
+        frames = np.asarray(samples[i * frame_len:j * frame_len]).reshape(j - i, frame_len)
+        power[i:j] = np.square(frames, dtype=np.float32).mean(axis=1)
+    power /= scale * scale
+    return 10 * np.log10(power + 1e-12), frame_len
+
+def speech_threshold(energy_db) -> float:
+    """Adaptive speech/silence threshold (dBFS) for one recording."""
+    if len(energy_db) == 0:
+        return MIN_SPEECH_DB
+    floor, loud = np.percentile(energy_db, [10, 95])
+    # speech must clear the noise floor *and* be near the loud frames;
+    # either condition alone would let steady room noise count as speech
+    return float(max(MIN_SPEECH_DB, floor + NOISE_MARGIN_DB, loud - DYNAMIC_RANGE_DB))
+
+def _runs(mask):
+    """(starts, ends) index arrays of the runs of True in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def _bridge(starts, ends, min_gap):
+    """Merge consecutive runs separated by fewer than `min_gap` units."""
+    if len(starts) < 2:
+        return starts, ends
+    keep = (starts[1:] - ends[:-1]) >= min_gap
+    return starts[np.r_[True, keep]], ends[np.r_[keep, True]]
+
+def speech_segments(samples, sr: int, max_s: float = None) -> list:
+    """
+    Return the speech in `samples` as sorted (start, end) sample ranges.
+
+    If `max_s` is given, longer segments are cut at their quietest frame so
+    that none exceeds `max_s` seconds.
+    """
+    energy, frame_len = frame_energy_db(samples, sr)
+    voiced = energy > speech_threshold(energy)
+    starts, ends = _runs(voiced)
+    starts, ends = _bridge(starts, ends, round(MIN_PAUSE_S * 1000 / FRAME_MS))
+    long_enough = (ends - starts) >= max(1, round(MIN_SPEECH_S * 1000 / FRAME_MS))
+    starts, ends = starts[long_enough], ends[long_enough]
+
+    pad = int(PAD_S * sr)
+    starts = np.maximum(starts * frame_len - pad, 0)
+    ends = np.minimum(ends * frame_len + pad, len(samples))
+    starts, ends = _bridge(starts, ends, 1)  # padding may make neighbours touch
+
+    segments = list(zip(starts.tolist(), ends.tolist()))
+    if max_s is None:
+        return segments
+    max_len = int(max_s * sr)
+    out = []
+    for start, end in segments:
+        while end - start > max_len:
+            # cut at the quietest frame in the second half of the window
+            lo = (start + max_len // 2) // frame_len
+            hi = max(lo + 1, (start + max_len) // frame_len)
+            cut = (lo + int(np.argmin(energy[lo:hi]))) * frame_len
+            out.append((start, cut))
+            start = cut
+        out.append((start, end))
+    return out
+
+def pack_segments(segments, max_len: int) -> list:
+    """
+    Group consecutive (start, end) segments into chunks whose total length
+    is at most `max_len` samples; returns a list of segment lists.
+    """
+    chunks, current, total = [], [], 0
+    for start, end in segments:
+        length = end - start
+        if current and total + length > max_len:
+            chunks.append(current)
+            current, total = [], 0
+        current.append((start, end))
+        total += length
+    if current:
+        chunks.append(current)
+    return chunks
+
+def speech_seconds(segments, sr: int) -> float:
+    """Total length of `segments` in seconds."""
+    return sum(end - start for start, end in segments) / sr
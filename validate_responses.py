@@ -1,84 +1,120 @@
 import argparse
-import pandas as pd
 import re
+import unicodedata
 from pathlib import Path
 
+MIN_WORDS = 10
+# bare yes/no answers, after lowercasing and dropping accents and punctuation
+YES_NO = {"yes", "no", "y", "n", "si", "s"}
+CHUNK_ROWS = 100_000  # rows validated at a time
+MAX_LISTED = 50       # failed entries printed before summarizing the rest
+
+def _letters(text: str) -> str:
+    """Lowercase letters of `text` with accents removed ("Sí." → "si")."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return re.sub(r"[\W\d_]", "", "".join(c for c in text if not unicodedata.combining(c)))
+
 def is_trivial(text):
     """
     Returns True if text is empty or trivial (e.g., just yes/no or very short).
     """
     if not text or not isinstance(text, str) or not text.strip():
         return True
-    # lowercase and strip punctuation
-    t = re.sub(r"[^a-zA-Z]", "", text).lower()
-    # check if only yes/no or monosyllabic
-    if t in {"yes", "no", "y", "n"}:
+    # check if only yes/no ("sí", "No.", ...)
+    if _letters(text) in YES_NO:
         return True
     # too short (less than 10 words)
-    if len(text.split()) < 10:
+    if len(text.split()) < MIN_WORDS:
         return True
     return False
 
 def validate(df, column):
     """
-    Validate responses in the given column.
-    Returns a list of booleans: True if valid, False if failed.
+    Validate responses in the given column, all rows at once with pandas
+    string operations; same rules as `is_trivial`.
+    Returns a boolean Series: True if valid, False if failed.
     """
-    results = []
-    for idx, resp in enumerate(df[column]):
-        fail = is_trivial(resp)
-        results.append(not fail)
-    return results
-
-def main():
-    parser = argparse.ArgumentParser(
-        description="Validate transcripts: non-empty, non-trivial responses"
-    )
-    parser.add_argument(
-        "input_csv",
-        type=Path,
-        help="Path to the transcripts CSV file"
-    )
-    parser.add_argument(
-        "--column",
-        type=str,
-        default="transcript",
-        help="Name of the transcript column to validate"
+    raw = df[column]
+    # non-strings (NaN, numbers) are trivial: as text they're under MIN_WORDS anyway
+    is_text = raw.notna()
+    text = raw.fillna("").astype(str)
+    letters = (
+        text.str.lower()
+            .str.normalize("NFKD")
+            .str.replace(r"[\W\d_]", "", regex=True)  # also drops the combining accents
     )
-    args = parser.parse_args()
+    words = text.str.count(r"\S+")
+    trivial = ~is_text | letters.isin(YES_NO) | (words < MIN_WORDS)
+    return ~trivial
+
+def _validated_chunks(chunks, column):
+    """Yield (chunk with `valid_response`, first row number) for each chunk."""
+    row = 0
+    for chunk in chunks:
+        chunk["valid_response"] = validate(chunk, column)
+        yield chunk, row
+        row += len(chunk)
+
+def _jsonl_chunks(input_jsonl: Path, column: str, chunk_rows: int):
+    # imported here so that CSV validation doesn't load the JSONL reader
+    from build_transcript import iter_whisper_jsonl
+    for block in iter_whisper_jsonl(input_jsonl, chunk_rows):
+        # blocks only have duplicate_of if they hold a duplicate; keep the columns of every chunk alike
+        yield block.drop(columns="duplicate_of", errors="ignore").rename(
+            columns={"transcript_whisper": column}
+        )
+
+def validate_csv(input_csv: Path, column: str = "transcript", chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Annotate `input_csv` with a `valid_response` column, write the
+    `_validated.csv` and `alarms.csv` next to it, reading `chunk_rows`
+    rows at a time. A `.jsonl` (Whisper output) is validated directly, its
+    `transcript` key standing in for `column`. Returns the total/failed counts.
+    """
+    import pandas as pd  # only here, so is_trivial and --help don't pay for it
 
-    # Read the data
-    df = pd.read_csv(args.input_csv)
+    input_csv = Path(input_csv)
+    if input_csv.suffix.lower() == ".jsonl":
+        chunks = _jsonl_chunks(input_csv, column, chunk_rows)
+    else:
+        # the transcript column stays text even if an answer looks like a number
+        chunks = pd.read_csv(input_csv, chunksize=chunk_rows, dtype={column: "object"},
+                             keep_default_na=False)
 
-    # Validate
-    valid_mask = validate(df, args.column)
-    # Convert the list to a Pandas Series if necessary.
-    if not isinstance(valid_mask, pd.Series):
-        valid_mask = pd.Series(valid_mask, index=df.index)
+    out_csv = input_csv.with_name(input_csv.stem + "_validated.csv")
+    alarms_csv = input_csv.with_name("alarms.csv")
+    total = failed = 0
+    listed = []
+    for chunk, first_row in _validated_chunks(chunks, column):
+        valid_mask = chunk["valid_response"]
+        header = first_row == 0
+        # Write annotated CSV and alarms, chunk by chunk
+        chunk.to_csv(out_csv, index=False, mode="w" if header else "a", header=header)
+        alarms_df = chunk[~valid_mask]
+        alarms_df.to_csv(alarms_csv, index=False, mode="w" if header else "a", header=header)
 
-    df['valid_response'] = valid_mask
+        total += len(chunk)
+        failed += len(alarms_df)
+        if len(listed) < MAX_LISTED and len(alarms_df):
+            rows = pd.Series(range(first_row + 1, first_row + len(chunk) + 1), index=chunk.index)
+            shown = alarms_df.head(MAX_LISTED - len(listed))
+            listed += (
+                "  Row " + rows[shown.index].astype(str) + ": "
+                + shown["audio_filepath"].astype(str) + " - '" + shown[column].astype(str) + "'"
+            ).tolist()
 
     # Summary
-    total = len(df)
-    failed = total - sum(valid_mask)
     print(f"Total responses: {total}")
     print(f"Failed (empty/trivial): {failed}")
 
     # Print each failed
     if failed > 0:
         print("\nFailed entries:")
-        for i, ok in enumerate(valid_mask):
-            if not ok:
-                row = df.iloc[i]
-                print(f"  Row {i+1}: {row['audio_filepath']} - '{row[args.column]}'")
-
-    # Write annotated CSV
-    out_csv = args.input_csv.with_name(args.input_csv.stem + "_validated.csv")
-    df.to_csv(out_csv, index=False)
-    print(f"Annotated CSV written to: {out_csv}")
+        print("\n".join(listed))
+        if failed > len(listed):
+            print(f"  … and {failed - len(listed)} more (see alarms.csv)")
 
-    alarms_df = df[~valid_mask]
-    alarms_df.to_csv(args.input_csv.with_name("alarms.csv"), index=False)
+    print(f"Annotated CSV written to: {out_csv}")
     print("Alarms CSV file written to: alarms.csv")
 
     # Optionally, could add color output with ANSI
@@ -87,5 +123,31 @@ def main():
     else:
         print("\033[91mSome responses failed validation. See list above.\033[0m")
 
+    return {"total": total, "failed": failed}
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate transcripts: non-empty, non-trivial responses"
+    )
+    parser.add_argument(
+        "input_csv",
+        type=Path,
+        help="Path to the transcripts CSV file, or a whisper_output.jsonl"
+    )
+    parser.add_argument(
+        "--column",
+        type=str,
+        default="transcript",
+        help="Name of the transcript column to validate"
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=CHUNK_ROWS,
+        help=f"Rows read and validated at a time (default: {CHUNK_ROWS})"
+    )
+    args = parser.parse_args()
+    validate_csv(args.input_csv, args.column, max(1, args.chunk_rows))
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,19 +1,41 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
 import json
-import torch
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from collections import deque
 from pathlib import Path
-from pydub import AudioSegment
-import io, math
-import soundfile as sf
+import math
+import numpy as np
 import warnings
+from functools import partial
+import prescreen
+import vad as vad_mod
+from asr_backends import BACKENDS, ASRBackend, build_backend
+from audio_fingerprint import DEFAULT_DB_PATH as DEFAULT_FINGERPRINT_DB
+from audio_fingerprint import FingerprintDB, config_key, fingerprint
+from instrumentation import RunReport, peak_rss_mb, profiled, report_path_for
+from transcript_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_MB, TranscriptCache, audio_key
+from validate_responses import MIN_WORDS
 warnings.filterwarnings(
     "ignore",
     message=".*The input name `inputs` is deprecated.*"
 )
 
 MAX_CHUNK_S = 28  # Whisper’s ~30 s limit
+LANGUAGE = "spanish"
+# Short names for --model-id; all multilingual, from most to least accurate
+MODEL_ALIASES = {
+    "large-v3": "openai/whisper-large-v3",
+    "large-v3-turbo": "openai/whisper-large-v3-turbo",
+    "medium": "openai/whisper-medium",
+    "small": "openai/whisper-small",
+    "base": "openai/whisper-base",
+}
 
 def parse_args():
     p = argparse.ArgumentParser(
@@ -29,9 +51,97 @@ def parse_args():
         default=Path("whisper_output.jsonl"),
         help="Path to write Whisper JSONL output"
     )
-    return p.parse_args()
+    p.add_argument(
+        "--batch-size", type=int, default=1,
+        help="Number of chunks (from any files) sent to the model at once (default: 1)"
+    )
+    p.add_argument(
+        "--backend", choices=sorted(BACKENDS), default="transformers",
+        help="ASR engine (default: transformers)"
+    )
+    p.add_argument(
+        "--model-id", default=None,
+        help="Model id, local path or one of " + ", ".join(MODEL_ALIASES)
+             + " (default: the backend's large-v3)"
+    )
+    p.add_argument(
+        "--quantize", action="store_true",
+        help="transformers backend on CPU: dynamic int8 quantization of the linear layers"
+    )
+    p.add_argument(
+        "--cache", type=Path, default=DEFAULT_CACHE_PATH,
+        help=f"Transcript cache file (default: {DEFAULT_CACHE_PATH})"
+    )
+    p.add_argument(
+        "--cache-max-mb", type=int, default=DEFAULT_MAX_MB,
+        help=f"Size cap of the transcript cache before LRU eviction (default: {DEFAULT_MAX_MB})"
+    )
+    p.add_argument(
+        "--no-cache", action="store_true",
+        help="Neither read nor write the transcript cache"
+    )
+    p.add_argument(
+        "--refresh", action="store_true",
+        help="Ignore cached transcripts but store the new ones"
+    )
+    p.add_argument(
+        "--resume", action="store_true",
+        help="Keep the records already in --output_jsonl and only transcribe missing or re-converted files"
+    )
+    p.add_argument(
+        "--vad", action="store_true",
+        help="Chunk on pauses found by voice activity detection and skip silence"
+    )
+    p.add_argument(
+        "--prescreen", action="store_true",
+        help="Measure speech before the model: no model for empty takes, --fast-model for short ones"
+    )
+    p.add_argument(
+        "--fast-model", default="small",
+        help="Model for short takes with --prescreen (default: small)"
+    )
+    p.add_argument(
+        "--dedup", action="store_true",
+        help="Transcribe identical or near-identical recordings once (audio fingerprints)"
+    )
+    p.add_argument(
+        "--fingerprint-db", type=Path, default=DEFAULT_FINGERPRINT_DB,
+        help=f"Fingerprints of recordings seen so far, for --dedup (default: {DEFAULT_FINGERPRINT_DB})"
+    )
+    p.add_argument(
+        "--workers", type=int, default=1,
+        help="Worker processes, each with its own model, sharing one queue of WAVs (default: 1)"
+    )
+    p.add_argument(
+        "--torch-threads", type=int, default=None,
+        help="torch intra-op threads per process (default: torch's own, or cores / workers)"
+    )
+    p.add_argument(
+        "--interop-threads", type=int, default=None,
+        help="torch inter-op threads per process (default: torch's own)"
+    )
+    p.add_argument(
+        "--profile", type=Path, default=None,
+        help="Write cProfile stats of the run to this file"
+    )
+    args = p.parse_args()
+    if args.quantize and args.backend != "transformers":
+        p.error("--quantize only applies to --backend transformers "
+                "(ctranslate2 already runs int8 on CPU)")
+    return args
 
-def build_whisper_pipeline(model_id="openai/whisper-large-v3"):
+def build_whisper_pipeline(model_id="openai/whisper-large-v3", quantize: bool = False):
+    """
+    Whisper ASR pipeline for `model_id` (a hub id, local path or a
+    MODEL_ALIASES name). With `quantize` on CPU, the linear layers are
+    dynamically quantized to int8: roughly half the memory and faster
+    decoding, at a small cost in accuracy.
+    """
+    # heavy imports, deferred so that --help and the other stages start fast
+    import torch
+    from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+
+    model_id = MODEL_ALIASES.get(model_id, model_id)
     device = 0 if torch.cuda.is_available() else -1
     dtype  = torch.float16 if torch.cuda.is_available() else torch.float32
 
@@ -40,6 +150,14 @@ def build_whisper_pipeline(model_id="openai/whisper-large-v3"):
         low_cpu_mem_usage=True,
         use_safetensors=True,
     ).to(f"cuda:{device}" if device >= 0 else "cpu")
+    if quantize:
+        if device >= 0:
+            print("⚠️  --quantize is CPU-only; running the float16 model on the GPU", file=sys.stderr)
+        else:
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            model.quantization = "dynamic-int8"
 
     """
     model.generation_config.language = "<|es|>"
@@ -54,64 +172,847 @@ def build_whisper_pipeline(model_id="openai/whisper-large-v3"):
         feature_extractor=proc.feature_extractor,
         device=device,
         torch_dtype=dtype,
-        generate_kwargs={"language": "spanish", "task": "transcribe"},
+        generate_kwargs={"language": LANGUAGE, "task": "transcribe"},
     )
 
-def transcribe_file(pipe, wav_path: Path) -> dict:
-    """Split `wav_path` into MAX_CHUNK_S-second pieces, transcribe each, and return the full transcript."""
-    audio = AudioSegment.from_file(wav_path, format="wav")
+def model_config(pipe) -> dict:
+    """Model settings of a transformers ASR pipeline that decide its transcripts."""
+    model = getattr(pipe, "model", None)
+    config = {
+        "model_id": getattr(model, "name_or_path", None),
+        "dtype": str(getattr(model, "dtype", "")),
+        "language": LANGUAGE,
+        "task": "transcribe",
+    }
+    if getattr(model, "quantization", None):
+        config["quantization"] = model.quantization
+    return config
 
-    total_ms = len(audio)
+def set_torch_threads(threads: int = None, interop_threads: int = None):
+    """Apply the intra-/inter-op thread counts that are given; call before loading the model."""
+    if not (threads or interop_threads):
+        return
+    import torch
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            # only settable once, before any inter-op parallel work
+            print(f"⚠️  Could not set inter-op threads: {e}", file=sys.stderr)
+
+def transcription_config(pipe, vad: bool = False) -> dict:
+    """Everything besides the audio that decides the transcript; part of the cache key."""
+    config = pipe.config() if isinstance(pipe, ASRBackend) else model_config(pipe)
+    config.update({
+        "max_chunk_s": MAX_CHUNK_S,
+        "chunking": "vad" if vad else "fixed",
+    })
+    if vad:
+        config["vad"] = {
+            name: getattr(vad_mod, name)
+            for name in ("FRAME_MS", "MIN_SPEECH_DB", "NOISE_MARGIN_DB", "DYNAMIC_RANGE_DB",
+                         "MIN_PAUSE_S", "MIN_SPEECH_S", "PAD_S")
+        }
+    return config
+
+def _pcm16_layout(wav_path: Path):
+    """
+    Return (data_offset, n_samples, sample_rate) if `wav_path` is a plain
+    16-bit PCM mono WAV (what convert_and_trim writes), else None.
+    """
+    with wav_path.open("rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"fmt ":
+                body = f.read(size)
+                if len(body) < 16:
+                    return None
+                tag, channels, sr, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                fmt = (tag, channels, sr, bits)
+                f.seek(size % 2, 1)  # chunks are word-aligned
+            elif chunk_id == b"data":
+                if fmt is None:
+                    return None
+                tag, channels, sr, bits = fmt
+                if tag not in (1, 0xFFFE) or channels != 1 or bits != 16:
+                    return None
+                offset = f.tell()
+                # ffmpeg leaves the size unset when writing to a pipe
+                available = wav_path.stat().st_size - offset
+                return offset, min(size, available) // 2, sr
+            else:
+                f.seek(size + size % 2, 1)
+
+def load_audio(wav_path: Path):
+    """
+    Read `wav_path` once and return (samples, sample_rate).
+
+    16-bit PCM mono WAVs are memory-mapped as int16, so nothing is decoded
+    up front and slices are views into the file; other formats are read
+    with soundfile as float32 (downmixed to mono).
+    """
+    layout = _pcm16_layout(wav_path)
+    if layout is not None:
+        offset, n_samples, sr = layout
+        if n_samples == 0:
+            return np.zeros(0, dtype=np.int16), sr
+        return np.memmap(wav_path, dtype="<i2", mode="r", offset=offset, shape=(n_samples,)), sr
+    import soundfile as sf
+    data, sr = sf.read(str(wav_path), dtype="float32")
+    if data.ndim > 1:
+        data = data.mean(axis=1, dtype=np.float32)
+    return data, sr
+
+def to_float32(samples):
+    """Scale int16 PCM to float32 in [-1, 1); float32 input is returned as is."""
+    if samples.dtype == np.int16:
+        return np.multiply(samples, 1 / 32768, dtype=np.float32)
+    return np.asarray(samples, dtype=np.float32)
+
+def chunk_bounds(n_samples: int, sr: int) -> list:
+    """
+    Split `n_samples` into (start, end) sample ranges of at most MAX_CHUNK_S
+    seconds, avoiding a last chunk shorter than ~4 s where possible.
+    """
+    total_ms = round(1000 * n_samples / sr)
     chunk_ms = MAX_CHUNK_S * 1000
 
     # keep reducing chunk_ms by 2000 ms until either:
     #  1) total_ms < chunk_ms → stop
     #  2) the remainder (total_ms % chunk_ms) exceeds 4000 → stop
-    while chunk_ms <= total_ms and (total_ms % chunk_ms) <= 4000:
+    # (never below 2 s, where the loop would otherwise divide by zero)
+    while chunk_ms > 2000 and chunk_ms <= total_ms and (total_ms % chunk_ms) <= 4000:
         chunk_ms -= 2000
 
     num_chunks = math.ceil(total_ms / chunk_ms)
-
-    texts = []
+    bounds = []
     for i in range(num_chunks):
-        start = i * chunk_ms
-        end = min((i + 1) * chunk_ms, total_ms)
-        chunk = audio[start:end]
-        # Export to an in-memory WAV and read back as numpy + sample rate
-        buf = io.BytesIO()
-        chunk.export(buf, format="wav")
-        buf.seek(0)
-        # read audio into numpy array
-        data, sr = sf.read(buf)
-
-        # now call the ASR pipeline with (array, sampling_rate)
-        res = pipe(data)
+        start = i * chunk_ms * sr // 1000
+        end = min((i + 1) * chunk_ms * sr // 1000, n_samples)
+        bounds.append((start, end))
+    if bounds:
+        bounds[-1] = (bounds[-1][0], n_samples)
+    return bounds
 
-        texts.append(res.get("text", "").strip())
+def audio_duration(n_samples: int, sr: int) -> int:
+    """Whole seconds of audio, as reported in the JSONL `duration` field."""
+    return math.floor(round(1000 * n_samples / sr) / 1000)
 
-    transcript = " ".join(texts)
-    audio_duration = math.floor(total_ms / 1000) # Convert milliseconds to seconds
+def plan_chunks(samples, sr: int, vad: bool = False) -> list:
+    """
+    Decide what goes to the model for one file: a list of chunks, each a
+    list of (start, end) sample ranges that together last at most
+    MAX_CHUNK_S seconds.
+
+    Without `vad` the file is cut into fixed windows (`chunk_bounds`); with
+    it only detected speech is kept, split on pauses.
+    """
+    if vad:
+        segments = vad_mod.speech_segments(samples, sr, max_s=MAX_CHUNK_S)
+        return vad_mod.pack_segments(segments, MAX_CHUNK_S * sr)
+    return [[bounds] for bounds in chunk_bounds(len(samples), sr)]
 
-    return {
-        "transcript": transcript,
-        "duration": audio_duration
+def chunk_input(samples, ranges):
+    """float32 model input for one planned chunk; only this chunk is copied."""
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        return to_float32(samples[start:end])
+    return np.concatenate([to_float32(samples[start:end]) for start, end in ranges])
+
+def _file_result(texts, samples, sr, plan, vad):
+    result = {
+        "transcript": " ".join(t for t in texts if t) if vad else " ".join(texts),
+        "duration": audio_duration(len(samples), sr),
     }
+    if vad:
+        result["speech_seconds"] = round(
+            sum(end - start for ranges in plan for start, end in ranges) / sr, 2
+        )
+    return result
 
-def main():
-    args = parse_args()
-    pipe = build_whisper_pipeline()
+def transcribe_file(pipe, wav_path: Path, vad: bool = False) -> dict:
+    """Split `wav_path` into MAX_CHUNK_S-second pieces, transcribe each, and return the full transcript."""
+    samples, sr = load_audio(wav_path)
+    plan = plan_chunks(samples, sr, vad)
+
+    texts = []
+    for ranges in plan:
+        res = pipe({"raw": chunk_input(samples, ranges), "sampling_rate": sr})
+        texts.append(res.get("text", "").strip())
+
+    return _file_result(texts, samples, sr, plan, vad)
+
+def transcribe_files(pipe, wav_paths, batch_size: int = 1, stats: dict = None,
+                     cache: TranscriptCache = None, refresh: bool = False,
+                     vad: bool = False, loader=None, report: RunReport = None):
+    """
+    Transcribe `wav_paths` with chunks from consecutive files gathered into
+    batches of `batch_size` for the model.
+
+    Yields (wav_path, result) in input order, each file as soon as all of
+    its chunks are done. With a `cache`, files whose audio was transcribed
+    before with the same config are answered from it (unless `refresh`),
+    and new results are stored. `vad` chunks on detected speech (see
+    `plan_chunks`). `loader(path) -> (samples, sr)` replaces `load_audio`,
+    e.g. to decode other formats. If `stats` is given, "files", "chunks",
+    "audio_seconds", "model_seconds", "cache_hits" and "cache_misses" are
+    accumulated into it. A `report` gets per-file and per-batch timings.
+    """
+    if stats is None:
+        stats = {}
+    for key in ("files", "chunks", "audio_seconds", "model_seconds", "cache_hits", "cache_misses"):
+        stats.setdefault(key, 0)
+    config = transcription_config(pipe, vad) if cache is not None else None
+    if loader is None:
+        loader = load_audio
 
-    with args.output_jsonl.open("w", encoding="utf-8") as out:
-        for wav in sorted(args.audio_dir.glob("*.wav"), key=lambda p: p.name):
-            if wav.name.startswith("."):
+    pending = deque()  # files whose chunks are queued or in flight, in order
+    batch = []         # (file entry, chunk index, chunk seconds, model input)
+
+    def run_batch():
+        t0 = time.perf_counter()
+        # the HF pipeline pops keys from the input dicts, so read nothing back
+        outputs = pipe([inp for *_, inp in batch], batch_size=len(batch))
+        dt = time.perf_counter() - t0
+        stats["model_seconds"] += dt
+        for (entry, i, seconds, _), res in zip(batch, outputs):
+            entry["texts"][i] = res.get("text", "").strip()
+            entry["left"] -= 1
+            entry["model_seconds"] += dt / len(batch)
+            stats["chunks"] += 1
+            stats["audio_seconds"] += seconds
+        if report is not None:
+            report.add_batch(len(batch), dt, sum(seconds for _, _, seconds, _ in batch))
+        batch.clear()
+
+    def finished():
+        while pending and pending[0]["left"] == 0:
+            entry = pending.popleft()
+            stats["files"] += 1
+            result = entry.get("result")
+            if result is None:
+                result = _file_result(
+                    entry["texts"], entry["samples"], entry["sr"], entry["plan"], vad
+                )
+                if entry["key"] is not None:
+                    cache.put(entry["key"], result)
+            if report is not None:
+                report.add_file(
+                    entry["wav"], cached=entry.get("plan") is None,
+                    duration=result.get("duration"), chunks=len(entry.get("plan") or ()),
+                    load_seconds=entry["load_seconds"], model_seconds=entry.get("model_seconds", 0.0),
+                )
+            yield entry["wav"], dict(result)
+
+    for wav in wav_paths:
+        t0 = time.perf_counter()
+        samples, sr = loader(wav)
+        load_seconds = time.perf_counter() - t0
+        key = None
+        if cache is not None:
+            key = audio_key(samples, sr, config)
+            cached = None if refresh else cache.get(key)
+            if cached is not None:
+                stats["cache_hits"] += 1
+                pending.append({"wav": wav, "result": cached, "left": 0,
+                                "load_seconds": load_seconds})
+                yield from finished()
                 continue
-            print(f"🔊 Whisper → {wav.name}", end="… ")
-            result = transcribe_file(pipe, wav)
+            stats["cache_misses"] += 1
+        plan = plan_chunks(samples, sr, vad)
+        entry = {
+            "wav": wav,
+            "key": key,
+            "texts": [""] * len(plan),
+            "left": len(plan),
+            "samples": samples,
+            "sr": sr,
+            "plan": plan,
+            "load_seconds": load_seconds,
+            "model_seconds": 0.0,
+        }
+        pending.append(entry)
+        for i, ranges in enumerate(plan):
+            data = chunk_input(samples, ranges)
+            batch.append((entry, i, len(data) / sr, {"raw": data, "sampling_rate": sr}))
+            if len(batch) >= batch_size:
+                run_batch()
+                yield from finished()
+        yield from finished()
+
+    if batch:
+        run_batch()
+    yield from finished()
+
+def format_throughput(stats: dict) -> str:
+    """One-line summary of the counters filled in by `transcribe_files`."""
+    model_s = stats.get("model_seconds", 0) or 1e-9
+    audio_s = stats.get("audio_seconds", 0)
+    rtf = f"{model_s / audio_s:.3f}" if audio_s else "n/a"
+    return (
+        f"⚡ {stats.get('files', 0)} files, {stats.get('chunks', 0)} chunks, "
+        f"{audio_s:.1f}s audio in {model_s:.1f}s model time → "
+        f"{stats.get('chunks', 0) / model_s:.2f} chunks/s, "
+        f"{audio_s / model_s:.1f}× real time (RTF {rtf})"
+    )
+
+def wav_stamp(wav: Path) -> list:
+    """Size and mtime of `wav`, kept in its record so --resume notices a re-conversion."""
+    st = wav.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+def load_done(jsonl_path: Path) -> dict:
+    """
+    Return {audio_filepath: wav_stamp} of the records in `jsonl_path`
+    (None for records written without a stamp).
+
+    A partial final line (a run killed mid-write) is cut off so that new
+    records are appended on a clean line; other unreadable lines are skipped.
+    """
+    done = {}
+    if not jsonl_path.is_file():
+        return done
+    good_end = 0
+    needs_newline = False
+    with jsonl_path.open("rb") as f:
+        for line in f:
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                obj = None
+            if obj is None and not f.peek(1):
+                break  # torn final record
+            good_end += len(line)
+            needs_newline = not line.endswith(b"\n")
+            if isinstance(obj, dict) and obj.get("audio_filepath"):
+                done[obj["audio_filepath"]] = obj.get("wav_stamp")
+            elif line.strip():
+                print(f"⚠️  Skipping unreadable line in {jsonl_path.name}")
+    if good_end < jsonl_path.stat().st_size:
+        print(f"⚠️  Dropping truncated last record of {jsonl_path.name}")
+        with jsonl_path.open("r+b") as f:
+            f.truncate(good_end)
+    elif needs_newline:
+        with jsonl_path.open("ab") as f:
+            f.write(b"\n")
+    return done
+
+def is_done(wav: Path, done: dict) -> bool:
+    """True if `done` (see `load_done`) holds a record of `wav` as it is on disk now."""
+    stamp = done.get(str(wav.resolve()))
+    return stamp is not None and wav.is_file() and stamp == wav_stamp(wav)
+
+def drop_outdated(jsonl_path: Path) -> dict:
+    """
+    Remove the records of `jsonl_path` whose WAV is gone (a stale output
+    removed by convert_and_trim) or changed since it was transcribed (e.g.
+    re-converted with a new trim), so that --resume redoes or forgets
+    them. Returns `load_done` of the records kept.
+    """
+    done = load_done(jsonl_path)  # also cuts off a torn last line
+    current = {}  # audio_filepath → wav_stamp now, None if gone
+
+    def outdated(obj):
+        path = obj.get("audio_filepath")
+        if path not in current:
+            wav = Path(path)
+            current[path] = wav_stamp(wav) if wav.is_file() else None
+        return current[path] is None or obj.get("wav_stamp") != current[path]
+
+    kept, dropped = [], 0
+    with jsonl_path.open("rb") if done else contextlib.nullcontext(()) as f:
+        for line in f:
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                obj = None
+            if isinstance(obj, dict) and obj.get("audio_filepath") and outdated(obj):
+                dropped += 1
+            else:
+                kept.append(line)
+    if not dropped:
+        return done
+    tmp = jsonl_path.with_name(jsonl_path.name + ".tmp")
+    tmp.write_bytes(b"".join(kept))
+    os.replace(tmp, jsonl_path)
+    print(f"♻️  Dropped {dropped} outdated records from {jsonl_path.name}")
+    return load_done(jsonl_path)
+
+class JsonlWriter:
+    """
+    Write one JSON record per line, flushed and fsynced as it is written, so
+    a crash loses at most the record in flight.
+    """
+
+    def __init__(self, path: Path, append: bool = False):
+        self.path = path
+        self._f = path.open("a" if append else "w", encoding="utf-8")
+
+    def write(self, record: dict):
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_worker = {}
+
+def _init_worker(backend, model_id, backend_kwargs, threads, cache_path, cache_max_bytes, options):
+    """Pool initializer: load the model once per worker process."""
+    set_torch_threads(*threads)
+    _worker["pipe"] = build_backend(backend, model_id, **backend_kwargs)
+    _worker["cache"] = TranscriptCache(cache_path, cache_max_bytes) if cache_path else None
+    _worker["options"] = options
+
+def _worker_transcribe(wavs: list):
+    stats, report = {}, RunReport()
+    results = list(transcribe_files(
+        _worker["pipe"], wavs, stats=stats, cache=_worker["cache"], report=report,
+        **_worker["options"]
+    ))
+    return results, stats, (report.files, report.batches)
+
+def start_pool(workers: int, model_id: str = None, torch_threads: int = None,
+               cache_path: Path = None, cache_max_bytes: int = DEFAULT_MAX_MB * 2**20,
+               backend: str = "transformers", backend_kwargs: dict = None,
+               interop_threads: int = None, **options):
+    """
+    Start `workers` processes, each loading `model_id` with `backend` (and
+    `backend_kwargs`) once, with `torch_threads` and `interop_threads`
+    threads. Each worker opens the cache at `cache_path` itself, if given;
+    `options` (batch_size, refresh, vad) go to its `transcribe_files`.
+    The pool is a context manager; feed it with `transcribe_pooled`.
+    """
+    if torch_threads is None:
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    ctx = multiprocessing.get_context("spawn")  # no forked torch state
+    return ctx.Pool(
+        workers, initializer=_init_worker,
+        initargs=(backend, model_id, backend_kwargs or {}, (torch_threads, interop_threads),
+                  cache_path, cache_max_bytes, options),
+    )
+
+def transcribe_pooled(pool, wav_paths, stats: dict = None, report: RunReport = None,
+                      files_per_task: int = 1):
+    """
+    Transcribe `wav_paths` on a `start_pool` pool, its workers pulling
+    groups of `files_per_task` consecutive files from a shared queue, so
+    that chunks of different files still share the workers' batches (pass
+    the pool's batch_size). Yields (wav_path, result) in input order, like
+    `transcribe_files`; the workers' timings are gathered into `report`.
+    """
+    # the pool would otherwise pull a generator from its own thread
+    wav_paths = list(wav_paths)
+    groups = [wav_paths[i:i + files_per_task] for i in range(0, len(wav_paths), files_per_task)]
+    for results, group_stats, (files, batches) in pool.imap(_worker_transcribe, groups):
+        if stats is not None:
+            for key, value in group_stats.items():
+                stats[key] = stats.get(key, 0) + value
+        if report is not None:
+            report.files += files
+            report.batches += batches
+        yield from results
+
+def transcribe_parallel(wav_paths, workers: int, model_id: str = None, stats: dict = None,
+                        report: RunReport = None, **pool_options):
+    """
+    `transcribe_pooled` on a pool started for just these `wav_paths` (see
+    `start_pool` for `workers`, `model_id` and `pool_options`); no
+    processes are started when there is nothing to transcribe.
+    """
+    wav_paths = list(wav_paths)
+    if not wav_paths:
+        return
+    with start_pool(workers, model_id, **pool_options) as pool:
+        yield from transcribe_pooled(pool, wav_paths, stats=stats, report=report,
+                                     files_per_task=pool_options.get("batch_size", 1))
+
+def dedup_config(backend: str = "transformers", model_id: str = None, vad: bool = False,
+                 fast_model: str = None, **backend_kwargs) -> dict:
+    """What a stored transcript must have been made with to be given to a duplicate."""
+    config = {"backend": backend, "model_id": model_id, "vad": vad, **backend_kwargs}
+    if fast_model is not None:
+        config["prescreen"] = {"fast_model": fast_model, "empty_speech_s": prescreen.EMPTY_SPEECH_S,
+                               "short_speech_s": prescreen.SHORT_SPEECH_S}
+    return config
+
+# what `transcribe_prescreened` adds to a result, about how *it* was transcribed
+_ROUTE_FIELDS = ("route", "speech_seconds", "saved_seconds", "escalated")
+
+def _real_time_factor(stats: dict):
+    audio_s = stats.get("audio_seconds", 0)
+    return stats.get("model_seconds", 0) / audio_s if audio_s else None
+
+def transcribe_deduplicated(transcribe, wav_paths, fingerprints: FingerprintDB, config: dict,
+                            loader=None, stats: dict = None, report: RunReport = None):
+    """
+    Transcribe each distinct recording among `wav_paths` only once.
+
+    Every file is fingerprinted (see `audio_fingerprint`) and looked up in
+    `fingerprints`. A file matching a recording seen before, earlier in
+    this run or in another folder, is not transcribed: it gets that
+    recording's transcript, its own duration and `duplicate_of` (the
+    original's path). `transcribe(wavs)` transcribes the others, yielding
+    (wav_path, result) for each, like `transcribe_files`; their transcripts
+    are stored under `config` for later duplicates.
+
+    When the original went through `transcribe_prescreened`, a duplicate
+    gets route "duplicate", its own "speech_seconds" and as "saved_seconds"
+    its audio length times this run's real-time factor (None before any
+    model has run), instead of the original's routing fields.
+
+    Yields (wav_path, result); a duplicate comes right after its original,
+    or as soon as it is found if the original was transcribed earlier. If
+    `stats` is given, "duplicates" is counted in it.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("duplicates", 0)
+    key = config_key(config)
+    if loader is None:
+        loader = load_audio
+    recording_of = {}  # unique wav of this run → its recording id
+    results = {}       # recording id → transcript, once known
+    waiting = {}       # recording id → duplicates found before its transcript
+    ready = deque()    # duplicates whose transcript is known, not yet yielded
+
+    def duplicate(entry, result):
+        stats["duplicates"] += 1
+        if report is not None:
+            report.add_file(entry["wav"], duplicate_of=entry["duplicate_of"],
+                            duration=entry["duration"])
+        record = {k: v for k, v in result.items() if k not in _ROUTE_FIELDS}
+        record.update(duration=entry["duration"], duplicate_of=entry["duplicate_of"])
+        if "route" in result:
+            rtf = _real_time_factor(stats)
+            record.update(route="duplicate", speech_seconds=round(entry["speech_seconds"], 2),
+                          saved_seconds=None if rtf is None else round(rtf * entry["seconds"], 2))
+        return entry["wav"], record
+
+    def unique_wavs():
+        for wav in wav_paths:
+            samples, sr = loader(wav)
+            hashes, times = fingerprint(samples, sr)
+            seconds = len(samples) / sr
+            match = fingerprints.match(wav.resolve(), hashes, times, seconds)
+            if match is not None:
+                recording, original, _ = match
+                entry = {"wav": wav, "duplicate_of": original, "seconds": seconds,
+                         "duration": audio_duration(len(samples), sr),
+                         "speech_seconds": prescreen.speech_seconds(samples, sr)}
+                stored = results.get(recording) or fingerprints.get_result(recording, key)
+                if stored is not None:
+                    ready.append(duplicate(entry, stored))
+                    continue
+                if recording in waiting:  # original is being transcribed in this run
+                    waiting[recording].append(entry)
+                    continue
+                # an original never transcribed with this config: transcribe this one
+            recording = fingerprints.add(wav.resolve(), hashes, times, seconds)
+            recording_of[wav] = recording
+            waiting[recording] = []
+            yield wav
+
+    for wav, result in transcribe(unique_wavs()):
+        recording = recording_of.pop(wav)
+        results[recording] = dict(result)
+        fingerprints.put_result(recording, key, result)
+        yield wav, result
+        for entry in waiting.pop(recording):
+            yield duplicate(entry, results[recording])
+        while ready:
+            yield ready.popleft()
+    while ready:
+        yield ready.popleft()
+
+def transcribe_prescreened(transcribe, transcribe_fast, wav_paths, loader=None,
+                           stats: dict = None, report: RunReport = None):
+    """
+    Route each of `wav_paths` by how much speech it holds (see `prescreen`)
+    before any model runs. Takes without speech get an empty transcript
+    and no model at all; short takes go to `transcribe_fast`, after the
+    others; the rest to `transcribe`. Both are called as `f(wavs, stats=...)`
+    and yield (wav_path, result) like `transcribe_files`. A short take whose
+    fast transcript still reaches MIN_WORDS words isn't trivial after all
+    and is transcribed again by `transcribe` ("escalated").
+
+    Every result gets its "route", "speech_seconds" and "saved_seconds":
+    the model time saved against `transcribe`, estimated from the real-time
+    factors measured in this run (None before the large model has run).
+
+    Yields (wav_path, result) for every file, empty takes as soon as the
+    large model's speed is known. If `stats` is given, the model counters
+    of both routes (kept up to date as files finish) plus "routed_empty",
+    "routed_fast", "escalated" and "saved_seconds" are accumulated into it.
+    """
+    if stats is None:
+        stats = {}
+    for key in ("routed_empty", "routed_fast", "escalated", "saved_seconds"):
+        stats.setdefault(key, 0)
+    if loader is None:
+        loader = load_audio
+    full_stats, fast_stats = {}, {}
+    before = dict(stats)
+    screened = {}    # wav → (speech seconds, audio seconds)
+    short = []       # wavs for the fast model
+    empty = deque()  # (wav, result) of takes without speech, not yet yielded
+
+    def merge_counters():
+        for key in set(full_stats) | set(fast_stats):
+            stats[key] = before.get(key, 0) + full_stats.get(key, 0) + fast_stats.get(key, 0)
+
+    def finish(wav, result, route, escalated=False):
+        merge_counters()
+        speech_s, audio_s = screened.pop(wav)
+        full_rtf, fast_rtf = _real_time_factor(full_stats), _real_time_factor(fast_stats)
+        saved = None
+        if route == "full":
+            # an escalated take cost its fast pass for nothing
+            saved = -fast_rtf * audio_s if escalated and fast_rtf is not None else 0.0
+        elif full_rtf is not None:
+            saved = (full_rtf - (fast_rtf if route == "fast" else 0.0)) * audio_s
+        if saved:
+            stats["saved_seconds"] += saved
+        result.update(route=route, speech_seconds=round(speech_s, 2),
+                      saved_seconds=None if saved is None else round(saved, 2))
+        if escalated:
+            result["escalated"] = True
+        if route == "empty" and report is not None:
+            report.add_file(wav, route=route, duration=result["duration"])
+        return wav, result
+
+    def full_wavs():
+        for wav in wav_paths:
+            samples, sr = loader(wav)
+            speech_s = prescreen.speech_seconds(samples, sr)
+            screened[wav] = (speech_s, len(samples) / sr)
+            route = prescreen.route(speech_s)
+            if route == "empty":
+                stats["routed_empty"] += 1
+                empty.append((wav, {"transcript": "", "duration": audio_duration(len(samples), sr)}))
+            elif route == "fast":
+                stats["routed_fast"] += 1
+                short.append(wav)
+            else:
+                yield wav
+
+    for wav, result in transcribe(full_wavs(), stats=full_stats):
+        yield finish(wav, result, "full")
+        while empty:
+            yield finish(*empty.popleft(), "empty")
+    while empty:
+        yield finish(*empty.popleft(), "empty")
+
+    escalate = []
+    for wav, result in transcribe_fast(short, stats=fast_stats):
+        if len(result.get("transcript", "").split()) >= MIN_WORDS:
+            escalate.append(wav)
+            continue
+        yield finish(wav, result, "fast")
+    stats["escalated"] += len(escalate)
+    for wav, result in transcribe(escalate, stats=full_stats):
+        yield finish(wav, result, "full", escalated=True)
+    merge_counters()
+
+def transcribe_stages(transcribe, wav_paths, stats: dict = None, report: RunReport = None,
+                      transcribe_fast=None, fingerprints: FingerprintDB = None,
+                      fingerprint_config: dict = None):
+    """
+    Transcribe `wav_paths` with `transcribe(wavs, stats=...)` (e.g. a
+    `transcribe_files` partial) behind the optional pre-ASR stages: with
+    `transcribe_fast`, takes are routed by their amount of speech
+    (`transcribe_prescreened`); with `fingerprints`, duplicates are
+    transcribed once (`transcribe_deduplicated`, keyed on
+    `fingerprint_config`, usually a `dedup_config`). Yields (wav_path, result).
+    """
+    if stats is None:
+        stats = {}
+
+    def run(wavs):
+        if transcribe_fast is None:
+            return transcribe(wavs, stats=stats)
+        return transcribe_prescreened(transcribe, transcribe_fast, wavs, stats=stats, report=report)
+
+    if fingerprints is None:
+        return run(wav_paths)
+    return transcribe_deduplicated(
+        run, wav_paths, fingerprints, fingerprint_config, stats=stats, report=report
+    )
+
+def transcribers(pipe, fast_pipe=None, cache: TranscriptCache = None,
+                 report: RunReport = None, **options) -> tuple:
+    """
+    The (transcribe, transcribe_fast) pair for `transcribe_stages` in this
+    process: `transcribe_files` on `pipe` and, for pre-screened short
+    takes, on `fast_pipe` (None without one), both with `cache`, `report`
+    and `options`.
+    """
+    transcribe = partial(transcribe_files, pipe, cache=cache, report=report, **options)
+    if fast_pipe is None:
+        return transcribe, None
+    return transcribe, partial(transcribe_files, fast_pipe, cache=cache, report=report, **options)
+
+def transcribe_to_jsonl(transcribe, wav_paths, output_jsonl: Path, append: bool = False,
+                        stats: dict = None, report: RunReport = None, **stages) -> int:
+    """
+    Run `wav_paths` through `transcribe_stages` (`stages`: transcribe_fast,
+    fingerprints, fingerprint_config) into `output_jsonl`; returns the
+    number of records written.
+    """
+    if stats is None:
+        stats = {}
+    results = transcribe_stages(transcribe, wav_paths, stats=stats, report=report, **stages)
+    return write_jsonl(results, output_jsonl, append=append, stats=stats)
+
+def list_wavs(audio_dir: Path) -> list:
+    """The .wav files of `audio_dir` in name order, skipping hidden files."""
+    return [
+        wav for wav in sorted(audio_dir.glob("*.wav"), key=lambda p: p.name)
+        if not wav.name.startswith(".")
+    ]
+
+def skip_done(wavs, output_jsonl: Path) -> list:
+    """
+    Drop the `wavs` already transcribed into `output_jsonl` as they are now,
+    after removing its outdated records (see `drop_outdated`).
+    """
+    done = drop_outdated(output_jsonl)
+    todo = [wav for wav in wavs if not is_done(wav, done)]
+    print(f"⏭  Resuming: {len(wavs) - len(todo)} files already in {output_jsonl}")
+    return todo
+
+def write_jsonl(results, output_jsonl: Path, append: bool = False, stats: dict = None) -> int:
+    """
+    Write the (wav, result) pairs of `results` as they arrive; returns how
+    many, also counted as "written" in `stats` if given.
+    """
+    count = 0
+    with JsonlWriter(output_jsonl, append=append) as out:
+        for wav, result in results:
             result["audio_filepath"] = str(wav.resolve())
-            out.write(json.dumps(result, ensure_ascii=False) + "\n")
-            print("done")
+            result["wav_stamp"] = wav_stamp(wav)
+            out.write(result)
+            print(f"🔊 Whisper → {wav.name}… done")
+            count += 1
+    if stats is not None:
+        stats["written"] = stats.get("written", 0) + count
+    return count
+
+def transcribe_folder(pipe, audio_dir: Path, output_jsonl: Path, resume: bool = False,
+                      cache: TranscriptCache = None, stats: dict = None,
+                      report: RunReport = None, fast_pipe=None,
+                      fingerprints: FingerprintDB = None, fingerprint_config: dict = None,
+                      **options) -> int:
+    """
+    Transcribe every WAV in `audio_dir` with an already loaded `pipe` into
+    `output_jsonl`; `options` go to `transcribe_files`. With `fast_pipe`,
+    short takes go to it and empty ones to no model; with `fingerprints`,
+    duplicates are transcribed once (see `transcribe_stages`). Returns the
+    number of records written.
+    """
+    wavs = list_wavs(audio_dir)
+    if resume:
+        wavs = skip_done(wavs, output_jsonl)
+    transcribe, transcribe_fast = transcribers(pipe, fast_pipe, cache=cache, report=report, **options)
+    return transcribe_to_jsonl(
+        transcribe, wavs, output_jsonl, append=resume, stats=stats, report=report,
+        transcribe_fast=transcribe_fast, fingerprints=fingerprints,
+        fingerprint_config=fingerprint_config,
+    )
+
+def main():
+    args = parse_args()
+
+    wavs = list_wavs(args.audio_dir)
+    if args.resume:
+        wavs = skip_done(wavs, args.output_jsonl)
+
+    stats = {}
+    cache_max_bytes = args.cache_max_mb * 2**20
+    options = {"batch_size": max(1, args.batch_size), "refresh": args.refresh, "vad": args.vad}
+    backend_kwargs = {"quantize": True} if args.quantize else {}
+    report = RunReport(
+        command="whisper_transcribe", audio_dir=args.audio_dir, backend=args.backend,
+        model_id=args.model_id, workers=args.workers, prescreen=args.prescreen,
+        fast_model=args.fast_model if args.prescreen else None, dedup=args.dedup,
+        **backend_kwargs, **options,
+    )
+    cache = None
+    fingerprints = FingerprintDB(args.fingerprint_db) if args.dedup else None
+    fast_model = args.fast_model if args.prescreen else None
+    with profiled(args.profile), contextlib.ExitStack() as pools:
+        if args.workers > 1:
+            print(f"⚙️  Transcribing with {args.workers} worker processes")
+            pool_options = dict(
+                torch_threads=args.torch_threads, cache_path=None if args.no_cache else args.cache,
+                cache_max_bytes=cache_max_bytes, backend=args.backend,
+                backend_kwargs=backend_kwargs, interop_threads=args.interop_threads, **options,
+            )
+            # one pool of the large model for the whole run, escalated takes included
+            pool = pools.enter_context(start_pool(args.workers, args.model_id, **pool_options))
+            transcribe = partial(transcribe_pooled, pool, report=report,
+                                 files_per_task=options["batch_size"])
+            transcribe_fast = None
+            if fast_model:
+                # used once, after the large model's share, and only if there are short takes
+                transcribe_fast = partial(transcribe_parallel, workers=args.workers,
+                                          model_id=fast_model, report=report, **pool_options)
+        else:
+            set_torch_threads(args.torch_threads, args.interop_threads)
+            with report.stage("load_model"):
+                pipe = build_backend(args.backend, args.model_id, **backend_kwargs)
+                fast_pipe = build_backend(args.backend, fast_model, **backend_kwargs) if fast_model else None
+            cache = None if args.no_cache else TranscriptCache(args.cache, cache_max_bytes)
+            transcribe, transcribe_fast = transcribers(
+                pipe, fast_pipe, cache=cache, report=report, **options
+            )
+
+        t0 = time.perf_counter()
+        with report.stage("transcribe") as info:
+            info["files"] = transcribe_to_jsonl(
+                transcribe, wavs, args.output_jsonl, append=args.resume, stats=stats,
+                report=report, transcribe_fast=transcribe_fast, fingerprints=fingerprints,
+                fingerprint_config=dedup_config(args.backend, args.model_id, args.vad, fast_model,
+                                                **backend_kwargs),
+            )
 
+    report.add_stats(stats)
+    print(format_throughput(stats))
+    print(f"⏱  {time.perf_counter() - t0:.1f}s wall clock")
+    peak = peak_rss_mb(children=args.workers > 1)
+    if peak is not None:
+        who = "largest worker" if args.workers > 1 else "this process"
+        print(f"🧠 Peak memory: {peak:.0f} MB ({who})")
+    if not args.no_cache:
+        print(f"🗄  Cache: {stats.get('cache_hits', 0)} hits, {stats.get('cache_misses', 0)} misses ({args.cache})")
+    if fast_model is not None:
+        print(f"🚦 Prescreen: {stats.get('routed_empty', 0)} empty takes skipped, "
+              f"{stats.get('routed_fast', 0)} short ones to {fast_model} "
+              f"({stats.get('escalated', 0)} sent on to the large model), "
+              f"~{stats.get('saved_seconds', 0):.1f}s of model time saved")
+    if fingerprints is not None:
+        print(f"🪞 Duplicates: {stats.get('duplicates', 0)} files given their original's transcript ({args.fingerprint_db})")
+        fingerprints.close()
+    if cache is not None:
+        cache.close()
     print(f"✅ Whisper output written to {args.output_jsonl}")
+    print(f"📈 Run report written to {report.write(report_path_for(args.output_jsonl))}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()